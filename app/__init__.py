@@ -1,13 +1,23 @@
 # app/__init__.py
+import os
+import click
 from flask import Flask
 from flask_cors import CORS
 from .config import Config
 
 # Import instances from extensions (Do NOT create new ones here)
-from .extensions import db, bcrypt, jwt, ma, migrate, limiter
+from .extensions import db, bcrypt, jwt, limiter, blocklist, password_hasher, response_cache, search_index, suggest_index, media, audit_log
 
 cors = CORS()
 
+
+def init_migrations(app):
+    """Register Flask-Migrate, needed by `flask db ...` and flask_migrate.upgrade()."""
+    from .extensions import migrate
+    # Absolute, so migrations are found whatever the working directory is
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
+
+
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
@@ -17,17 +27,27 @@ def create_app(config_class=Config):
     bcrypt.init_app(app)
     jwt.init_app(app)
     cors.init_app(app)
-    ma.init_app(app)
-    migrate.init_app(app, db)
+    # Only CLI invocations (`flask db upgrade`, ...) get migrations wired up;
+    # app servers skip importing alembic altogether
+    if click.get_current_context(silent=True) is not None:
+        init_migrations(app)
     limiter.init_app(app)
+    blocklist.init_app(app)
+
+    from .ratelimit import init_rate_limit_metrics
+    init_rate_limit_metrics(app, limiter)
+    password_hasher.init_app(app)
+    response_cache.init_app(app)
+    search_index.init_app(app)
+    suggest_index.init_app(app)
+    media.init_app(app)
+    audit_log.init_app(app)
 
     # JWT callback to check blacklist
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
-        from .models import TokenBlacklist
-        jti = jwt_payload.get('jti')
-        blacklist_entry = TokenBlacklist.query.filter_by(jti=jti).first()
-        return blacklist_entry is not None
+        # Answered from memory in the common case, see blocklist.py
+        return blocklist.is_revoked(jwt_payload.get('jti'))
 
     # JWT error handlers
     @jwt.expired_token_loader
@@ -45,6 +65,22 @@ def create_app(config_class=Config):
         from flask import jsonify
         return jsonify({"message": "Request does not contain an access token"}), 401
 
+    # Password hashing pool is saturated: shed load instead of queueing
+    from .hashing import HasherOverloaded
+
+    @app.errorhandler(HasherOverloaded)
+    def hasher_overloaded(error):
+        from flask import jsonify
+        response = jsonify({"message": "Server busy, please retry shortly"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    # Body over MAX_CONTENT_LENGTH; upload routes turn this into their own message
+    @app.errorhandler(413)
+    def request_too_large(error):
+        from flask import jsonify
+        return jsonify({"message": "Request body is too large"}), 413
+
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
         from flask import jsonify
@@ -54,14 +90,22 @@ def create_app(config_class=Config):
     from .auth import auth_bp
     from .routes import main_bp
     from .admin import admin_bp, generate_admin_token
+    from .media import media_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(media_bp)
+
+    from .commands import register_commands
+    register_commands(app)
+
+    from .querycount import init_query_budgets
+    init_query_budgets(app)
 
-    # Create DB and Admin Token on startup
-    with app.app_context():
-        db.create_all()
-        generate_admin_token()
+    # The schema is managed by migrations (`flask db upgrade`), run once per
+    # deploy rather than by every worker, so booting never touches the DB.
+    # The admin token lives in process memory and needs no app context.
+    generate_admin_token()
 
     return app
\ No newline at end of file
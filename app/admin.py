@@ -1,10 +1,14 @@
 # app/admin.py
+import csv
+import hashlib
+import io
 import secrets
 import time
 import os
-from flask import Blueprint, request, jsonify
+from contextlib import ExitStack, contextmanager
+from flask import Blueprint, Response, current_app, has_request_context, request, jsonify, stream_with_context
 from sqlalchemy import text
-from .extensions import db
+from .extensions import audit_log, db
 
 # TODO:
 # - Implement stricter validation and command whitelisting for SQL execution
@@ -14,12 +18,19 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/api/hidden/v1')
 
 admin_state = { "token": None, "expires_at": 0 }
 
+# Result modes of /exec. 'json' builds the whole response in memory (capped at
+# ADMIN_SQL_MAX_ROWS); 'ndjson' and 'csv' stream it in batches of
+# ADMIN_SQL_BATCH_SIZE rows straight from the cursor, so a worker holds one
+# batch at a time whatever the size of the result.
+RESULT_FORMATS = ('json', 'ndjson', 'csv')
+STREAM_MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
 # Byron: This is a simple logging mechanism to keep track of executed SQL commands and their results.
-def submit_to_logs(command, result):
+# Queued for the background audit log writer (app/audit.py), so the request never waits on the file.
+def submit_to_logs(command, result, event='sql'):
     """Submit executed command and result to logs (for auditing)"""
-    log_entry = f"{time.ctime()}: Executed SQL: {command} | Result: {result}\n"
-    with open("admin_sql_logs.txt", "a") as log_file:
-        log_file.write(log_entry)
+    audit_log.write(event, command=command, result=result,
+                    remote_addr=request.remote_addr if has_request_context() else None)
 
 # Byron: This is a temporary method to generate an admin token. In a production environment, 
 # I will implement a more secure and robust authentication mechanism for administrators.
@@ -33,6 +44,130 @@ def generate_admin_token():
     print(f" Valid until: {time.ctime(admin_state['expires_at'])}\n")
     return token
 
+def _bounded(value, cap, kind):
+    """A positive request parameter no larger than `cap`; `cap` if not given."""
+    if value is None:
+        return cap
+    value = kind(value)
+    if value <= 0:
+        raise ValueError("limit and timeout must be positive")
+    return min(value, cap)
+
+
+@contextmanager
+def statement_timeout(seconds):
+    """Abort statements on the session's connection that run past `seconds`.
+
+    Yields {'hit': bool}, set when the timeout fired. SQLite is interrupted
+    from a progress handler, so the clock covers fetching rows too (including
+    a streamed response waiting on the client); PostgreSQL uses
+    statement_timeout for the rest of the transaction. Other databases run
+    without a timeout.
+    """
+    expired = {'hit': False}
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        deadline = time.monotonic() + seconds
+        raw = connection.connection.driver_connection
+
+        def check():
+            expired['hit'] = time.monotonic() > deadline
+            return expired['hit']
+
+        raw.set_progress_handler(check, 10000)
+        try:
+            yield expired
+        finally:
+            raw.set_progress_handler(None, 0)
+    else:
+        if dialect == 'postgresql':
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(seconds * 1000))}")
+        yield expired
+
+
+def _batches(result, limit, size, state):
+    """Lists of up to `size` rows from `result`, stopping after `limit` rows in total.
+
+    Counts rows into state['rows'] and sets state['truncated'] when rows were
+    left over.
+    """
+    try:
+        for batch in result.partitions(size):
+            room = limit - state['rows']
+            if len(batch) > room:
+                state['truncated'] = True
+                batch = batch[:room]
+            if batch:
+                state['rows'] += len(batch)
+                yield batch
+            if state['truncated']:
+                break
+    finally:
+        result.close()
+
+
+def _result_summary(result_format, state, digest, **extra):
+    if not isinstance(digest, str):
+        digest = hashlib.sha256(digest).hexdigest()
+    return {'format': result_format, 'rows': state['rows'], 'truncated': state['truncated'],
+            'sha256': digest, **extra}
+
+
+def _stream_result(sql_command, result, result_format, limit, batch_size, stack, expired, timeout):
+    """Stream a SELECT as NDJSON (one object per row) or CSV (header row first).
+
+    NDJSON ends with a {"status": ...} line giving the row count, whether the
+    row limit cut the result short, or the error that stopped it; a CSV
+    response that fails midway is cut off instead. The audit log gets the row
+    count and a SHA-256 of the body, not the rows.
+    """
+    keys = list(result.keys())
+    dumps = current_app.json.dumps
+    state = {'rows': 0, 'truncated': False}
+    digest = hashlib.sha256()
+
+    def encode(batch):
+        if result_format == 'ndjson':
+            return ''.join(dumps(dict(zip(keys, row))) + '\n' for row in batch)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        return buffer.getvalue()
+
+    def chunk(body):
+        body = body.encode()
+        digest.update(body)
+        return body
+
+    def generate():
+        outcome = None
+        try:
+            with stack:
+                if result_format == 'csv':
+                    yield chunk(encode([keys]))
+                for batch in _batches(result, limit, batch_size, state):
+                    yield chunk(encode(batch))
+            outcome = {"status": "success", "rows": state['rows'], "truncated": state['truncated']}
+        except Exception as e:
+            db.session.rollback()
+            error = f"Statement exceeded the {timeout:g}s timeout" if expired['hit'] else str(e)
+            submit_to_logs(sql_command, _result_summary(result_format, state, digest.hexdigest(), error=error))
+            if result_format == 'csv':
+                raise
+            yield chunk(dumps({"status": "error", "error": error, "rows": state['rows']}) + '\n')
+            return
+        if result_format == 'ndjson':
+            yield chunk(dumps(outcome) + '\n')
+        submit_to_logs(sql_command, _result_summary(result_format, state, digest.hexdigest()))
+
+    response = Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPES[result_format])
+    # Reset the timeout even if the body is never read
+    response.call_on_close(stack.close)
+    response.headers['X-Row-Limit'] = str(limit)
+    # Let nginx pass rows on as they come instead of buffering the response
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # Byron: This is a dangerous method, I will keep it protected and later implement
 # an actual guideline for allowed commands so someone doesnt mess up the database.
 @admin_bp.route('/exec', methods=['POST'])
@@ -53,21 +188,59 @@ def execute_sql():
     try:
         data = request.get_json()
         sql_command = data.get('sql', '').strip()
-        result = db.session.execute(text(sql_command))
-        
+        result_format = data.get('format', 'json')
+        if result_format not in RESULT_FORMATS:
+            return jsonify({"error": f"format must be one of {', '.join(RESULT_FORMATS)}"}), 400
+        streaming = result_format != 'json'
+        max_rows = current_app.config['ADMIN_SQL_STREAM_MAX_ROWS' if streaming else 'ADMIN_SQL_MAX_ROWS']
+        limit = _bounded(data.get('limit'), max_rows, int)
+        timeout = _bounded(data.get('timeout'), current_app.config['ADMIN_SQL_TIMEOUT'], float)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    stack = ExitStack()
+    expired = {'hit': False}
+    try:
+        expired = stack.enter_context(statement_timeout(timeout))
         if sql_command.upper().startswith("SELECT"):
-            keys = result.keys()
-            data = [dict(zip(keys, row)) for row in result]
-            submit_to_logs(sql_command, data)
-            return jsonify({"status": "success", "data": data})
+            batch_size = current_app.config['ADMIN_SQL_BATCH_SIZE']
+            result = db.session.execute(text(sql_command), execution_options={'stream_results': True})
+            if streaming:
+                return _stream_result(sql_command, result, result_format, limit, batch_size, stack, expired, timeout)
+            with stack:
+                keys = result.keys()
+                state = {'rows': 0, 'truncated': False}
+                data = [dict(zip(keys, row)) for batch in _batches(result, limit, batch_size, state) for row in batch]
+            response = jsonify({"status": "success", "data": data, "truncated": state['truncated']})
+            submit_to_logs(sql_command, _result_summary('json', state, response.get_data()))
+            return response
         else:
-            db.session.commit()
+            with stack:
+                db.session.execute(text(sql_command))
+                db.session.commit()
             submit_to_logs(sql_command, "Executed without SELECT")
             return jsonify({"status": "success", "message": "Executed."})
     except Exception as e:
+        stack.close()
         db.session.rollback()
+        if expired['hit']:
+            return jsonify({"error": f"Statement exceeded the {timeout:g}s timeout"}), 400
         return jsonify({"error": str(e)}), 400
 
+
+# Per-process rate limiter hit/reject counts, keyed by route
+@admin_bp.route('/ratelimit/metrics', methods=['GET'])
+def rate_limit_metrics_view():
+    """Return rate limit hits and rejections per route for this worker"""
+    request_token = request.headers.get('X-Admin-Auth')
+    if not admin_state["token"] or request_token != admin_state["token"]:
+        return jsonify({"error": "Not Found"}), 404
+    if time.time() > admin_state["expires_at"]:
+        return jsonify({"error": "Session expired"}), 403
+
+    from .ratelimit import rate_limit_metrics
+    return jsonify({"status": "success", "pid": os.getpid(), "routes": rate_limit_metrics.snapshot()})
+
 # Byron: Invalidates the current admin token and logs it.
 @admin_bp.route('/logout', methods=['POST'])
 def logout():
@@ -75,5 +248,5 @@ def logout():
     global admin_state
     admin_state["token"] = None
     admin_state["expires_at"] = 0
-    submit_to_logs("Admin Logout", "Admin session ended")
+    submit_to_logs("Admin Logout", "Admin session ended", event='logout')
     return jsonify({"status": "success", "message": "Logged out"}), 200
\ No newline at end of file
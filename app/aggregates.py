@@ -0,0 +1,290 @@
+# app/aggregates.py
+import time
+from datetime import datetime, timezone
+from sqlalchemy import Float, case, cast, delete, func, insert, select, update
+from .extensions import db
+from .models import Movie, MovieReviewBucket, Review, ReviewLike
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+# Bayesian average for "top rated": every movie starts with RATING_PRIOR_WEIGHT
+# imaginary ratings of RATING_PRIOR_MEAN, so a single 5-star review cannot
+# outrank thousands of 4.8s. Changing these needs `flask ratings reconcile`.
+RATING_PRIOR_MEAN = 3.0
+RATING_PRIOR_WEIGHT = 10
+
+# "Trending" counts reviews created in the last TRENDING_WINDOW_HOURS, in
+# hourly buckets
+TRENDING_WINDOW_HOURS = 7 * 24
+# Seconds between checks for buckets that have left the window (per process)
+TRENDING_EXPIRE_INTERVAL = 60
+
+
+def rating_score(rating_sum, rating_count):
+    """Bayesian average of a movie's ratings; 0 for a movie nobody has rated."""
+    if not rating_count:
+        return 0.0
+    return (rating_sum + RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT) / (rating_count + RATING_PRIOR_WEIGHT)
+
+
+def _histogram_column(rating):
+    return getattr(Movie, f'rating_{int(rating)}_count')
+
+
+def apply_review_rating(movie_id, added=None, removed=None):
+    """Adjust a movie's rating aggregates for a review write.
+
+    Issues a single UPDATE with column arithmetic (rating_sum = rating_sum + x)
+    so concurrent writers never lose increments. Call it before committing so
+    the aggregate change lands in the same transaction as the review itself.
+    """
+    sum_delta = count_delta = 0
+    histogram_deltas = {}
+    if added is not None:
+        sum_delta += added
+        count_delta += 1
+        histogram_deltas[int(added)] = histogram_deltas.get(int(added), 0) + 1
+    if removed is not None:
+        sum_delta -= removed
+        count_delta -= 1
+        histogram_deltas[int(removed)] = histogram_deltas.get(int(removed), 0) - 1
+    if not count_delta and not sum_delta:
+        return
+
+    new_count = Movie.rating_count + count_delta
+    values = {
+        Movie.rating_sum: Movie.rating_sum + sum_delta,
+        Movie.rating_count: new_count,
+        # Its similarity to other movies needs recomputing (recommend.py)
+        Movie.neighbors_stale: True,
+        # SET expressions see the pre-update row, so the new average is
+        # derived from the old columns plus this write's deltas.
+        Movie.rating_avg: case(
+            (new_count > 0, cast(Movie.rating_sum + sum_delta, Float) / new_count),
+            else_=0.0
+        ),
+        Movie.rating_score: case(
+            (new_count > 0, (cast(Movie.rating_sum + sum_delta, Float) + RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT)
+             / (new_count + RATING_PRIOR_WEIGHT)),
+            else_=0.0
+        ),
+    }
+    for rating, delta in histogram_deltas.items():
+        if delta:
+            column = _histogram_column(rating)
+            values[column] = column + delta
+
+    db.session.execute(
+        update(Movie)
+        .where(Movie.id == movie_id)
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rebuild_movie_ratings():
+    """Recompute every movie's rating aggregates from the reviews table.
+
+    Returns the number of movies whose stored aggregates were out of sync.
+    """
+    histogram = [func.sum(case((Review.rating == i, 1), else_=0)) for i in RATING_VALUES]
+    rows = db.session.query(
+        Review.movie_id,
+        func.sum(Review.rating),
+        func.count(Review.id),
+        *histogram
+    ).group_by(Review.movie_id).all()
+    actual = {row[0]: tuple(int(v or 0) for v in row[1:]) for row in rows}
+
+    fixed = 0
+    for movie in Movie.query.all():
+        expected = actual.get(movie.id, (0,) * (2 + len(RATING_VALUES)))
+        expected_avg = expected[0] / expected[1] if expected[1] else 0.0
+        expected_score = rating_score(expected[0], expected[1])
+        stored = (movie.rating_sum, movie.rating_count) + tuple(
+            getattr(movie, f'rating_{i}_count') for i in RATING_VALUES
+        )
+        if stored == expected and movie.rating_avg == expected_avg and movie.rating_score == expected_score:
+            continue
+        movie.rating_sum, movie.rating_count = expected[0], expected[1]
+        movie.rating_avg = expected_avg
+        movie.rating_score = expected_score
+        for i, value in zip(RATING_VALUES, expected[2:]):
+            setattr(movie, f'rating_{i}_count', value)
+        fixed += 1
+
+    db.session.commit()
+    return fixed
+
+
+def trending_hour(when=None):
+    """The bucket a naive-UTC datetime (default: now) falls in: hours since the epoch."""
+    if when is None:
+        return int(time.time() // 3600)
+    return int(when.replace(tzinfo=timezone.utc).timestamp() // 3600)
+
+
+def apply_review_activity(movie_id, delta, created_at=None):
+    """Count a review created (delta=1) or deleted (delta=-1) towards "trending".
+
+    `created_at` is the review's creation time (default: now). A deleted
+    review only counts down if its hour is still inside the window; older
+    buckets are already gone. Call it before committing, like apply_review_rating.
+    """
+    hour = trending_hour(created_at)
+    if hour <= trending_hour() - TRENDING_WINDOW_HOURS:
+        return
+    if delta > 0:
+        _upsert_bucket(movie_id, hour, delta)
+    elif not _bump_bucket(movie_id, hour, delta):
+        return
+    db.session.execute(
+        update(Movie).where(Movie.id == movie_id).values(trending_count=Movie.trending_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _bump_bucket(movie_id, hour, delta):
+    bucket = (MovieReviewBucket.movie_id == movie_id) & (MovieReviewBucket.hour == hour)
+    return db.session.execute(
+        update(MovieReviewBucket).where(bucket).values(count=MovieReviewBucket.count + delta)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def _upsert_bucket(movie_id, hour, delta):
+    """Add to a bucket, creating it if needed, in one INSERT ... ON CONFLICT DO UPDATE.
+
+    Two first reviews of a movie in the same hour would otherwise race on
+    the INSERT, and the loser's IntegrityError would fail its review.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        if not _bump_bucket(movie_id, hour, delta):
+            db.session.execute(insert(MovieReviewBucket).values(movie_id=movie_id, hour=hour, count=delta))
+        return
+    statement = dialect_insert(MovieReviewBucket).values(movie_id=movie_id, hour=hour, count=delta)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[MovieReviewBucket.movie_id, MovieReviewBucket.hour],
+        set_={'count': MovieReviewBucket.count + statement.excluded.count},
+    ))
+
+
+def expire_trending(now_hour=None):
+    """Subtract the buckets that have left the trending window and delete them.
+
+    Only movies with an expired bucket are touched. Safe to run from several
+    processes: only the buckets this call's DELETE actually removed are
+    subtracted, so two overlapping runs never subtract a bucket twice.
+    Returns the number of movies updated.
+    """
+    cutoff = (trending_hour() if now_hour is None else now_hour) - TRENDING_WINDOW_HOURS + 1
+    expired = MovieReviewBucket.hour < cutoff
+    if db.session.get_bind().dialect.delete_returning:
+        rows = db.session.execute(
+            delete(MovieReviewBucket).where(expired).returning(MovieReviewBucket.movie_id, MovieReviewBucket.count)
+        ).all()
+    else:
+        # Row locks keep another run from reading the same buckets before they are deleted
+        rows = db.session.execute(
+            select(MovieReviewBucket.movie_id, MovieReviewBucket.count).where(expired).with_for_update()
+        ).all()
+        db.session.execute(delete(MovieReviewBucket).where(expired))
+    # Summed here rather than with GROUP BY so the lookup stays on the hour index
+    totals = {}
+    for movie_id, count in rows:
+        totals[movie_id] = totals.get(movie_id, 0) + count
+    for movie_id, total in totals.items():
+        db.session.execute(
+            update(Movie).where(Movie.id == movie_id).values(trending_count=Movie.trending_count - total)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    return len(totals)
+
+
+_trending_checked_at = 0.0
+
+
+def expire_trending_if_due():
+    """Run expire_trending at most every TRENDING_EXPIRE_INTERVAL seconds in this process."""
+    global _trending_checked_at
+    now = time.monotonic()
+    if now - _trending_checked_at < TRENDING_EXPIRE_INTERVAL:
+        return
+    _trending_checked_at = now
+    expire_trending()
+
+
+def rebuild_trending():
+    """Recompute movie_review_buckets and movies.trending_count from the reviews table.
+
+    Returns the number of movies whose trending count changed.
+    """
+    start = trending_hour() - TRENDING_WINDOW_HOURS + 1
+    since = datetime.fromtimestamp(start * 3600, timezone.utc).replace(tzinfo=None)
+    buckets = {}
+    rows = db.session.execute(select(Review.movie_id, Review.created_at).where(Review.created_at >= since))
+    for movie_id, created_at in rows:
+        key = (movie_id, trending_hour(created_at))
+        buckets[key] = buckets.get(key, 0) + 1
+    totals = {}
+    for (movie_id, _), count in buckets.items():
+        totals[movie_id] = totals.get(movie_id, 0) + count
+
+    db.session.execute(delete(MovieReviewBucket))
+    if buckets:
+        db.session.execute(insert(MovieReviewBucket), [
+            {'movie_id': movie_id, 'hour': hour, 'count': count} for (movie_id, hour), count in buckets.items()
+        ])
+    fixed = 0
+    for movie in Movie.query.all():
+        expected = totals.get(movie.id, 0)
+        if movie.trending_count != expected:
+            movie.trending_count = expected
+            fixed += 1
+    db.session.commit()
+    return fixed
+
+
+def apply_review_vote(review_id, likes_delta=0, dislikes_delta=0):
+    """Adjust a review's vote counters in the current transaction."""
+    if not likes_delta and not dislikes_delta:
+        return
+    db.session.execute(
+        update(Review)
+        .where(Review.id == review_id)
+        .values({
+            Review.likes_count: Review.likes_count + likes_delta,
+            Review.dislikes_count: Review.dislikes_count + dislikes_delta,
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rebuild_review_votes():
+    """Recompute every review's like/dislike counters from review_likes.
+
+    Returns the number of reviews whose stored counters were out of sync.
+    """
+    rows = db.session.query(
+        ReviewLike.review_id,
+        func.sum(case((ReviewLike.is_like.is_(True), 1), else_=0)),
+        func.sum(case((ReviewLike.is_like.is_(False), 1), else_=0))
+    ).group_by(ReviewLike.review_id).all()
+    actual = {row[0]: (int(row[1] or 0), int(row[2] or 0)) for row in rows}
+
+    fixed = 0
+    for review in Review.query.all():
+        expected = actual.get(review.id, (0, 0))
+        if (review.likes_count, review.dislikes_count) == expected:
+            continue
+        review.likes_count, review.dislikes_count = expected
+        fixed += 1
+
+    db.session.commit()
+    return fixed
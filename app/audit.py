@@ -0,0 +1,254 @@
+# app/audit.py
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+# Queued by close(); the writer finishes everything queued before it and exits
+_STOP = object()
+
+
+class _LogFile:
+    """The open audit log of one process: appends, rotation and fsync.
+
+    Every worker process appends to the same file with O_APPEND, one write(2)
+    per batch. Rotation happens under an flock on <path>.lock, and a writer
+    whose file was renamed away (by another worker or by logrotate) reopens
+    the path before its next batch.
+    """
+
+    def __init__(self, path, max_bytes, rotate_seconds, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self.fd = None
+
+    def _open(self):
+        self.close()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+
+    def _reopen_if_moved(self):
+        if self.fd is None:
+            return self._open()
+        try:
+            moved = os.stat(self.path).st_ino != os.fstat(self.fd).st_ino
+        except FileNotFoundError:
+            moved = True
+        if moved:
+            self._open()
+
+    def _rotation_due(self, incoming, now):
+        stat = os.fstat(self.fd)
+        if not stat.st_size:
+            return False
+        if self.max_bytes and stat.st_size + incoming > self.max_bytes:
+            return True
+        # Time-based: the file was last written in an earlier period
+        return bool(self.rotate_seconds) and stat.st_mtime // self.rotate_seconds != now // self.rotate_seconds
+
+    def _rotate(self, incoming, now):
+        import fcntl
+        with open(self.path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another worker may have rotated while we waited for the lock
+            self._reopen_if_moved()
+            if not self._rotation_due(incoming, now):
+                return
+            os.fsync(self.fd)
+            if self.backups:
+                for i in range(self.backups - 1, 0, -1):
+                    if os.path.exists(f'{self.path}.{i}'):
+                        os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+                os.replace(self.path, f'{self.path}.1')
+            else:
+                os.unlink(self.path)
+            self._open()
+
+    def write(self, data):
+        self._reopen_if_moved()
+        now = time.time()
+        if self._rotation_due(len(data), now):
+            self._rotate(len(data), now)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+    def sync(self):
+        if self.fd is not None:
+            os.fsync(self.fd)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+# Audit trail of admin actions, one JSON object per line:
+#   {"ts": ..., "pid": ..., "seq": ..., "event": ..., <fields>}
+#
+# write() only puts the record on a bounded queue (AUDIT_LOG_QUEUE_SIZE); a
+# writer thread per process drains whatever has accumulated and appends it
+# in a single write(2), so the request thread never touches the file. seq
+# numbers a process's records in the order they were written. When the queue
+# is full, write() waits up to AUDIT_LOG_ENQUEUE_TIMEOUT seconds and then
+# drops the record; the count of dropped records is itself logged.
+#
+# AUDIT_LOG_FSYNC decides when data is forced to disk: after every batch
+# ('always'), at most every AUDIT_LOG_FSYNC_INTERVAL seconds ('interval') or
+# when the OS gets to it ('never'). close(), also run at interpreter exit,
+# writes out everything queued and fsyncs whatever the policy.
+class AuditLog:
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._file = None
+        self._seq = 0
+        self._dropped = 0
+        self._atexit_registered = False
+        self._exiting = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_LOG_PATH', 'admin_audit.log')
+        app.config.setdefault('AUDIT_LOG_QUEUE_SIZE', 10000)
+        app.config.setdefault('AUDIT_LOG_ENQUEUE_TIMEOUT', 1.0)
+        app.config.setdefault('AUDIT_LOG_BATCH_SIZE', 1000)
+        app.config.setdefault('AUDIT_LOG_FSYNC', 'interval')
+        app.config.setdefault('AUDIT_LOG_FSYNC_INTERVAL', 1.0)
+        app.config.setdefault('AUDIT_LOG_MAX_BYTES', 50 * 1024 * 1024)
+        app.config.setdefault('AUDIT_LOG_ROTATE_SECONDS', 24 * 3600)
+        app.config.setdefault('AUDIT_LOG_BACKUPS', 10)
+        if app.config['AUDIT_LOG_FSYNC'] not in FSYNC_POLICIES:
+            raise ValueError(f"AUDIT_LOG_FSYNC must be one of {', '.join(FSYNC_POLICIES)}")
+        self.close()
+        self.path = os.path.abspath(app.config['AUDIT_LOG_PATH'])
+        self.queue_size = app.config['AUDIT_LOG_QUEUE_SIZE']
+        self.enqueue_timeout = app.config['AUDIT_LOG_ENQUEUE_TIMEOUT']
+        self.batch_size = app.config['AUDIT_LOG_BATCH_SIZE']
+        self.fsync = app.config['AUDIT_LOG_FSYNC']
+        self.fsync_interval = app.config['AUDIT_LOG_FSYNC_INTERVAL']
+        self.max_bytes = app.config['AUDIT_LOG_MAX_BYTES']
+        self.rotate_seconds = app.config['AUDIT_LOG_ROTATE_SECONDS']
+        self.backups = app.config['AUDIT_LOG_BACKUPS']
+        self.logger = app.logger
+
+    def _new_file(self):
+        return _LogFile(self.path, self.max_bytes, self.rotate_seconds, self.backups)
+
+    def _encode(self, records, dropped=0):
+        lines = []
+        if dropped:
+            records = [(time.time(), {'event': 'audit_records_dropped', 'count': dropped})] + records
+        for ts, fields in records:
+            self._seq += 1
+            record = {
+                'ts': datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec='milliseconds'),
+                'pid': os.getpid(),
+                'seq': self._seq,
+                **fields,
+            }
+            lines.append(json.dumps(record, default=str, separators=(',', ':')) + '\n')
+        return ''.join(lines).encode()
+
+    def _get_queue(self):
+        # Created lazily, and again after a fork: each pre-forked server
+        # worker needs its own writer thread
+        with self._lock:
+            if self._queue is None or self._pid != os.getpid():
+                self._queue = queue.Queue(self.queue_size)
+                self._pid = os.getpid()
+                self._seq = 0
+                self._dropped = 0
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), name='audit-log', daemon=True)
+                self._thread.start()
+                if not self._atexit_registered:
+                    atexit.register(self._at_exit)
+                    self._atexit_registered = True
+            return self._queue
+
+    def _run(self, records):
+        log_file = self._new_file()
+        last_sync = time.monotonic()
+        unsynced = False
+        while True:
+            # Wake up for a pending interval fsync even if nothing else arrives
+            timeout = self.fsync_interval if unsynced else None
+            try:
+                batch = [records.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(records.get_nowait())
+                except queue.Empty:
+                    break
+            stop = _STOP in batch
+            if stop:
+                batch = batch[:batch.index(_STOP)]
+            with self._lock:
+                dropped, self._dropped = self._dropped, 0
+            try:
+                if batch or dropped:
+                    log_file.write(self._encode(batch, dropped))
+                    unsynced = self.fsync != 'never'
+                if stop or (unsynced and (self.fsync == 'always'
+                                          or time.monotonic() - last_sync >= self.fsync_interval)):
+                    log_file.sync()
+                    last_sync, unsynced = time.monotonic(), False
+            except OSError:
+                self.logger.exception("Could not write %d audit record(s) to %s", len(batch), self.path)
+            if stop:
+                log_file.close()
+                return
+
+    def write(self, event, **fields):
+        """Record an admin action; returns as soon as it is queued."""
+        record = (time.time(), {'event': event, **fields})
+        # AUDIT_LOG_QUEUE_SIZE = 0 writes inline (handy for tests and scripts),
+        # as does anything logged while the interpreter is shutting down
+        if not self.queue_size or self._exiting:
+            with self._lock:
+                if self._file is None:
+                    self._file = self._new_file()
+                self._file.write(self._encode([record]))
+                if self.fsync == 'always':
+                    self._file.sync()
+            return
+        try:
+            self._get_queue().put(record, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+                first = self._dropped == 1
+            # Once per run of drops; the writer logs how many there were
+            if first:
+                self.logger.warning("Audit log queue is full, dropping records")
+
+    def close(self):
+        """Write out everything queued by this process, fsync and stop the writer."""
+        with self._lock:
+            thread, records = self._thread, self._queue
+            owned = self._pid == os.getpid()
+            self._thread = self._queue = self._pid = None
+            log_file, self._file = self._file, None
+        if thread is not None and owned and thread.is_alive():
+            records.put(_STOP)
+            thread.join()
+        if log_file is not None:
+            log_file.sync()
+            log_file.close()
+
+    def _at_exit(self):
+        self._exiting = True
+        self.close()
@@ -1,7 +1,7 @@
 # app/auth.py
 from flask import Blueprint, request, jsonify
-from .extensions import db, limiter, jwt
-from .models import User, TokenBlacklist
+from .extensions import db, limiter, jwt, blocklist
+from .models import User
 from .config import Config
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
 from datetime import datetime, timedelta
@@ -37,6 +37,8 @@ def login():
     user = User.query.filter_by(email=data.get('email')).first()
 
     if user and user.check_password(data.get('password')):
+        if user.rehash_password_if_needed(data.get('password')):
+            db.session.commit()
         access_token = create_access_token(identity=str(user.id), expires_delta=Config.JWT_ACCESS_TOKEN_EXPIRES)
         refresh_token = create_refresh_token(identity=str(user.id), expires_delta=Config.JWT_REFRESH_TOKEN_EXPIRES)
         return jsonify(access_token=access_token, refresh_token=refresh_token, username=user.username, user_id=user.id), 200
@@ -66,10 +68,12 @@ def logout():
     if not jti:
         return jsonify({"message": "Could not identify token"}), 400
     
-    # Add token to blacklist with expiration time
-    expires_at = datetime.utcnow() + Config.JWT_ACCESS_TOKEN_EXPIRES
-    blacklist_entry = TokenBlacklist(jti=jti, expires_at=expires_at)
-    db.session.add(blacklist_entry)
-    db.session.commit()
+    # Add token to blacklist until the token itself expires, after which the
+    # row can be pruned (flask blocklist prune)
+    if claims.get('exp'):
+        expires_at = datetime.utcfromtimestamp(claims['exp'])
+    else:
+        expires_at = datetime.utcnow() + Config.JWT_ACCESS_TOKEN_EXPIRES
+    blocklist.revoke(jti, expires_at)
     
     return jsonify({"message": "Successfully logged out"}), 200
\ No newline at end of file
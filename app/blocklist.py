@@ -0,0 +1,190 @@
+# app/blocklist.py
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings (no false negatives)."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+def _next_version():
+    """Increment blocklist_version in the current transaction and return the new value.
+
+    The UPDATE locks the row until commit, which serializes revocations.
+    """
+    from sqlalchemy import select, update
+    from .models import BlocklistVersion
+    from .extensions import db
+
+    bump = update(BlocklistVersion).where(BlocklistVersion.id == 1).values(version=BlocklistVersion.version + 1)
+    if db.session.get_bind().dialect.update_returning:
+        version = db.session.execute(bump.returning(BlocklistVersion.version)).scalar()
+    elif db.session.execute(bump).rowcount:
+        version = db.session.execute(select(BlocklistVersion.version).where(BlocklistVersion.id == 1)).scalar()
+    else:
+        version = None
+    if version is None:
+        # Tables made with db.create_all() have no counter row yet
+        version = 1
+        db.session.add(BlocklistVersion(id=1, version=version))
+    return version
+
+
+# Replaces the per-request `TokenBlacklist.query.filter_by(jti=...)` lookup.
+# Every revoked jti goes into a bloom filter, so the common case (token not
+# revoked) is answered from memory. Recently revoked jtis are also kept in a
+# bounded set so a positive answer usually needs no DB hit either; only bloom
+# hits that fell out of that set are confirmed against the table.
+#
+# Other workers learn about revocations by polling token_blacklist for rows
+# with a version above the highest one they have seen. The version comes from
+# the single blocklist_version row, incremented by the revoking transaction:
+# its row lock is held until commit, so versions become visible in order
+# (autoincrement ids do not; on PostgreSQL a lower id can commit later and
+# would be skipped). Polling happens at most every
+# BLOCKLIST_SYNC_INTERVAL seconds, which bounds how long a token revoked in
+# another process stays usable here. Revocations made by this process are
+# visible immediately.
+class TokenBlocklist:
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._recent = OrderedDict()
+        self._last_version = -1
+        self._last_sync = 0.0
+        self._pruner = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BLOCKLIST_SYNC_INTERVAL', 1.0)
+        app.config.setdefault('BLOCKLIST_RECENT_SIZE', 10000)
+        app.config.setdefault('BLOCKLIST_BLOOM_CAPACITY', 100000)
+        app.config.setdefault('BLOCKLIST_BLOOM_ERROR_RATE', 0.001)
+        app.config.setdefault('BLOCKLIST_PRUNE_INTERVAL', 0)
+        self.sync_interval = app.config['BLOCKLIST_SYNC_INTERVAL']
+        self.recent_size = app.config['BLOCKLIST_RECENT_SIZE']
+        self.bloom_capacity = app.config['BLOCKLIST_BLOOM_CAPACITY']
+        self.bloom_error_rate = app.config['BLOCKLIST_BLOOM_ERROR_RATE']
+        self._reset()
+
+        if app.config['BLOCKLIST_PRUNE_INTERVAL'] > 0:
+            self.start_pruner(app, app.config['BLOCKLIST_PRUNE_INTERVAL'])
+
+    def _reset(self, capacity=None):
+        self._bloom = BloomFilter(capacity or self.bloom_capacity, self.bloom_error_rate)
+        self._recent.clear()
+        self._last_version = -1
+        self._last_sync = 0.0
+
+    def _remember(self, jti):
+        self._bloom.add(jti)
+        self._recent[jti] = True
+        self._recent.move_to_end(jti)
+        while len(self._recent) > self.recent_size:
+            self._recent.popitem(last=False)
+
+    def _sync(self, force=False):
+        """Pull revocations committed by any process since the last sync."""
+        from .models import TokenBlacklist
+        from .extensions import db
+
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        rows = db.session.query(TokenBlacklist.version, TokenBlacklist.jti).filter(
+            TokenBlacklist.version > self._last_version
+        ).order_by(TokenBlacklist.version).all()
+        for version, jti in rows:
+            self._remember(jti)
+            self._last_version = version
+        self._last_sync = now
+
+        # An overfull filter degrades towards "always check the DB"; rebuild it bigger
+        if self._bloom.count > self._bloom.capacity:
+            self._rebuild(self._bloom.capacity * 2)
+
+    def _rebuild(self, capacity=None):
+        self._reset(capacity)
+        self._sync(force=True)
+
+    def is_revoked(self, jti):
+        from .models import TokenBlacklist
+
+        with self._lock:
+            self._sync()
+            if jti in self._recent:
+                return True
+            if jti not in self._bloom:
+                return False
+        # Bloom hit for a jti that is not in the recent set: confirm in the DB
+        return TokenBlacklist.query.filter_by(jti=jti).first() is not None
+
+    def revoke(self, jti, expires_at):
+        """Persist a revocation and make it visible to this process immediately."""
+        from .models import TokenBlacklist
+        from .extensions import db
+
+        db.session.add(TokenBlacklist(jti=jti, expires_at=expires_at, version=_next_version()))
+        db.session.commit()
+        with self._lock:
+            self._remember(jti)
+
+    def prune_expired(self, now=None):
+        """Delete revocations whose token has expired anyway. Returns rows deleted."""
+        from .models import TokenBlacklist
+        from .extensions import db
+
+        deleted = TokenBlacklist.query.filter(
+            TokenBlacklist.expires_at < (now or datetime.utcnow())
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        if deleted:
+            # Pruned jtis can never be presented again (they are expired), but
+            # dropping them keeps the filter sparse.
+            with self._lock:
+                self._rebuild()
+        return deleted
+
+    def start_pruner(self, app, interval):
+        """Run prune_expired every `interval` seconds on a daemon thread."""
+        if self._pruner is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    with app.app_context():
+                        self.prune_expired()
+                except Exception as e:
+                    app.logger.warning("Blocklist prune failed: %s", e)
+
+        self._pruner = threading.Thread(target=run, name='blocklist-pruner', daemon=True)
+        self._pruner.start()
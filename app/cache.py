@@ -0,0 +1,198 @@
+# app/cache.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from urllib.parse import urlencode
+from flask import make_response, request
+
+
+class _Entry:
+    __slots__ = ('body', 'status', 'mimetype', 'etag', 'last_modified', 'tags', 'generations', 'expires_at')
+
+    def __init__(self, body, status, mimetype, etag, last_modified, tags, generations, expires_at):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.etag = etag
+        self.last_modified = last_modified
+        self.tags = tags
+        self.generations = generations
+        self.expires_at = expires_at
+
+    def dumps(self):
+        return json.dumps({
+            'body': self.body.decode('utf-8'), 'status': self.status, 'mimetype': self.mimetype,
+            'etag': self.etag, 'last_modified': self.last_modified, 'tags': self.tags,
+            'generations': self.generations, 'expires_at': self.expires_at,
+        })
+
+    @classmethod
+    def loads(cls, raw):
+        data = json.loads(raw)
+        data['body'] = data['body'].encode('utf-8')
+        return cls(**data)
+
+
+class RedisTier:
+    """Shared tier on any Redis-compatible server (needs the `redis` package)."""
+
+    def __init__(self, url, prefix='rcache:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return _Entry.loads(raw) if raw else None
+
+    def set(self, key, entry, ttl):
+        self.client.set(self.prefix + key, entry.dumps(), ex=max(int(ttl), 1))
+
+    def generations(self, tags):
+        if not tags:
+            return {}
+        values = self.client.mget([f"{self.prefix}tag:{tag}" for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    def bump(self, tags):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(f"{self.prefix}tag:{tag}")
+        pipe.execute()
+
+
+# Response cache for public GET endpoints.
+#
+# Entries are keyed by endpoint + sorted query string and carry a list of
+# tags (e.g. "movie:3"). Every tag has a generation number; an entry records
+# the generations it was built under and is stale as soon as any of them has
+# been bumped. Write paths call invalidate(*tags) after committing, which
+# bumps the generations; nothing has to be scanned or deleted.
+#
+# Tier 1 is an in-process LRU. If RESPONSE_CACHE_REDIS_URL is set, entries
+# are also stored in Redis and tag generations live there, so invalidations
+# reach every worker immediately. Without it, generations are per process
+# and other workers may serve a stale entry for up to RESPONSE_CACHE_TTL
+# seconds.
+class ResponseCache:
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self.shared = None
+        self.enabled = True
+        self.max_entries = 1024
+        self.ttl = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+        app.config.setdefault('RESPONSE_CACHE_SIZE', 1024)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 30)
+        app.config.setdefault('RESPONSE_CACHE_REDIS_URL', None)
+        self.enabled = app.config['RESPONSE_CACHE_ENABLED']
+        self.max_entries = app.config['RESPONSE_CACHE_SIZE']
+        self.ttl = app.config['RESPONSE_CACHE_TTL']
+        self.shared = RedisTier(app.config['RESPONSE_CACHE_REDIS_URL']) if app.config['RESPONSE_CACHE_REDIS_URL'] else None
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+    def _current_generations(self, tags):
+        if self.shared is not None:
+            return self.shared.generations(tags)
+        with self._lock:
+            return {tag: self._generations.get(tag, 0) for tag in tags}
+
+    def invalidate(self, *tags):
+        """Mark every cached response carrying any of `tags` as stale."""
+        if not tags:
+            return
+        if self.shared is not None:
+            self.shared.bump(tags)
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not None:
+                self._store_local(key, entry)
+        if entry is None or entry.expires_at <= now:
+            return None
+        if self._current_generations(entry.tags) != entry.generations:
+            return None
+        return entry
+
+    def _store_local(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _store(self, key, entry):
+        self._store_local(key, entry)
+        if self.shared is not None:
+            self.shared.set(key, entry, self.ttl)
+
+    @staticmethod
+    def _to_response(entry):
+        response = make_response(entry.body, entry.status)
+        response.mimetype = entry.mimetype
+        response.set_etag(entry.etag)
+        response.last_modified = datetime.fromtimestamp(entry.last_modified, timezone.utc)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    def cached(self, tags, personalized=False):
+        """Cache a GET view's 200 responses under the tags returned by `tags(**view_args)`.
+
+        personalized=True skips the cache for requests carrying an
+        Authorization header, whose responses may contain per-user data.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or (personalized and request.headers.get('Authorization')):
+                    return view(*args, **kwargs)
+
+                # Re-encoded, so a value containing '&' or '=' cannot pass for another argument
+                key = f"{request.endpoint}:{json.dumps(kwargs, sort_keys=True)}?" + urlencode(
+                    sorted(request.args.items(multi=True))
+                )
+                entry = self._lookup(key)
+                if entry is not None:
+                    return self._to_response(entry)
+
+                entry_tags = list(tags(**kwargs))
+                generations = self._current_generations(entry_tags)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+
+                body = response.get_data()
+                entry = _Entry(
+                    body=body, status=response.status_code, mimetype=response.mimetype,
+                    etag=hashlib.sha1(body).hexdigest(), last_modified=int(time.time()),
+                    tags=entry_tags, generations=generations, expires_at=time.time() + self.ttl,
+                )
+                self._store(key, entry)
+                return self._to_response(entry)
+            return wrapper
+        return decorator
@@ -0,0 +1,236 @@
+# app/commands.py
+import click
+from flask.cli import AppGroup
+
+# Maintenance commands, run with e.g. `flask ratings reconcile`
+ratings_cli = AppGroup('ratings', help='Maintain denormalized movie rating aggregates.')
+votes_cli = AppGroup('votes', help='Maintain materialized review vote counters.')
+blocklist_cli = AppGroup('blocklist', help='Maintain the JWT revocation blocklist.')
+search_cli = AppGroup('search', help='Maintain the movie search index.')
+recs_cli = AppGroup('recs', help='Maintain precomputed recommendation data.')
+media_cli = AppGroup('media', help='Maintain uploaded images.')
+perf_cli = AppGroup('perf', help='Performance checks for development and CI.')
+
+
+@ratings_cli.command('reconcile')
+def reconcile_ratings():
+    """Rebuild movie rating aggregates and trending counts from the reviews table."""
+    from .aggregates import rebuild_movie_ratings, rebuild_trending
+    fixed = rebuild_movie_ratings()
+    trending = rebuild_trending()
+    click.echo(f"Reconciled rating aggregates ({fixed} movie(s) updated, "
+               f"{trending} trending count(s) corrected).")
+
+
+@votes_cli.command('reconcile')
+def reconcile_votes():
+    """Rebuild review like/dislike counters from the review_likes table."""
+    from .aggregates import rebuild_review_votes
+    fixed = rebuild_review_votes()
+    click.echo(f"Reconciled vote counters ({fixed} review(s) updated).")
+
+
+@blocklist_cli.command('prune')
+def prune_blocklist():
+    """Delete revoked-token rows whose token has already expired."""
+    from .extensions import blocklist
+    deleted = blocklist.prune_expired()
+    click.echo(f"Pruned {deleted} expired blocklist entr{'y' if deleted == 1 else 'ies'}.")
+
+
+@perf_cli.command('explain')
+@click.option('--verbose', is_flag=True, help='Print the plan of every statement.')
+def explain_queries(verbose):
+    """EXPLAIN every API query against a scratch SQLite DB; fail on full table scans.
+
+    Meant to be run as its own process (e.g. in CI): it builds a throwaway app
+    with the current models and indexes and drives each endpoint once.
+    """
+    from flask import current_app
+    from .queryplans import explain_api_queries
+
+    config_class = type('CurrentConfig', (object,), {
+        k: v for k, v in current_app.config.items() if k.isupper()
+    })
+    results = explain_api_queries(config_class)
+    failures = [r for r in results if r[2]]
+    for statement, plan, scans in results:
+        if verbose or scans:
+            click.echo(('FULL SCAN of ' + ', '.join(scans) if scans else 'ok') + ':')
+            click.echo('  ' + ' '.join(statement.split()))
+            for line in plan:
+                click.echo('    ' + line)
+    click.echo(f"{len(results)} distinct statement(s) checked, {len(failures)} with full table scans.")
+    if failures:
+        raise SystemExit(1)
+
+
+@perf_cli.command('queries')
+@click.option('--rows', default=20, show_default=True, help='Movies (and reviews per list) in the large run.')
+def check_query_growth(rows):
+    """Fail if a read endpoint runs more queries with many rows than with one (an N+1).
+
+    Like `perf explain`, it drives a throwaway app on a scratch SQLite DB.
+    """
+    from flask import current_app
+    from .queryplans import query_growth
+
+    config_class = type('CurrentConfig', (object,), {
+        k: v for k, v in current_app.config.items() if k.isupper()
+    })
+    results = query_growth(config_class, rows)
+    failures = [r for r in results if r[2] > r[1]]
+    for request, small, large in results:
+        click.echo(f"{'GROWS' if large > small else 'ok':<6} {small:>3} -> {large:>3}  {request}")
+    click.echo(f"{len(results)} endpoint(s) checked at 1 and {rows} rows, {len(failures)} with growing query counts.")
+    if failures:
+        raise SystemExit(1)
+
+
+@search_cli.command('rebuild')
+def rebuild_search_index():
+    """Re-index every movie and its reviews from scratch."""
+    from .extensions import db, search_index
+    count = search_index.rebuild()
+    db.session.commit()
+    if search_index.backend.name == 'fts5':
+        click.echo(f"Rebuilt the search index ({count} movie(s)).")
+    else:
+        click.echo(f"No FTS5 table in this database; workers build their own in-memory index "
+                   f"on first search ({count} movie(s) indexed as a check).")
+
+
+def _invalidate_recommendations():
+    """Drop cached /similar and recommendation responses after the neighbor lists change.
+
+    This process is not a worker: without the Redis tier the invalidation
+    only reaches its own (empty) cache, so say how long workers stay stale.
+    """
+    from .extensions import response_cache
+    response_cache.invalidate('neighbors')
+    if response_cache.shared is None:
+        click.echo("No RESPONSE_CACHE_REDIS_URL: workers keep serving cached recommendations "
+                   "for up to RESPONSE_CACHE_TTL seconds.")
+
+
+@recs_cli.command('refresh')
+@click.option('--full', is_flag=True, help='Recompute every movie, not just those with new ratings.')
+def refresh_recommendations(full):
+    """Recompute item-item neighbor lists for movies whose ratings changed."""
+    import time
+    from .recommend import refresh_neighbors
+    start = time.perf_counter()
+    count = refresh_neighbors(full=full)
+    _invalidate_recommendations()
+    click.echo(f"Recomputed neighbors for {count} movie(s) in {time.perf_counter() - start:.1f}s.")
+
+
+@recs_cli.command('build')
+@click.option('--workers', type=int, default=None, help='Processes to spread the work over  [default: CPU count]')
+@click.option('--top-k', type=int, default=None, help='Neighbors kept per movie  [default: NEIGHBORS_PER_MOVIE]')
+def build_recommendations(workers, top_k):
+    """Recompute every movie's neighbor list from scratch, across a process pool."""
+    import os
+    import resource
+    import time
+    from .recommend import NEIGHBORS_PER_MOVIE, refresh_neighbors
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    count = refresh_neighbors(full=True, k=top_k or NEIGHBORS_PER_MOVIE, workers=workers)
+    _invalidate_recommendations()
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux; for children it is the largest single worker
+    peak = f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB"
+    if workers > 1:
+        peak += f" (main), {resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024:.0f} MiB (largest worker)"
+    click.echo(f"Built neighbors for {count} movie(s) with {workers} worker(s) in {elapsed:.1f}s; {peak}.")
+
+
+@media_cli.command('variants')
+def write_media_variants():
+    """Write any missing resized variants of uploaded posters and avatars."""
+    import os
+    from .extensions import db, media
+    from .media import write_variants
+    from .models import Movie, User
+    written = images = 0
+    for kind, column in (('poster', Movie.image_url), ('avatar', User.profile_picture)):
+        for (url,) in db.session.query(column).filter(column.isnot(None)).distinct():
+            path = media.path_for_url(url)
+            if path is None or not os.path.exists(path):
+                continue
+            written += write_variants(path, kind)
+            images += 1
+    click.echo(f"Checked {images} uploaded image(s), wrote {written} variant file(s).")
+
+
+@media_cli.command('gc')
+@click.option('--grace-hours', type=float, default=None,
+              help='Keep unreferenced files younger than this  [default: MEDIA_GC_GRACE_SECONDS]')
+@click.option('--dry-run', is_flag=True, help='Report what would be deleted without deleting it.')
+def collect_media_garbage(grace_hours, dry_run):
+    """Delete uploaded images that no movie or user refers to anymore."""
+    from .extensions import media
+    grace_seconds = None if grace_hours is None else grace_hours * 3600
+    report = media.collect_garbage(grace_seconds, dry_run=dry_run)
+    mib = 1024 * 1024
+    click.echo(f"Scanned {report['scanned']} file(s), {report['scanned_bytes'] / mib:.1f} MiB. "
+               f"{'Would delete' if dry_run else 'Deleted'} {report['deleted']} unreferenced file(s), "
+               f"reclaiming {report['reclaimed_bytes'] / mib:.1f} MiB; "
+               f"{(report['scanned_bytes'] - report['reclaimed_bytes']) / mib:.1f} MiB in use.")
+
+
+# Run in a fresh interpreter by `perf startup`; prints import and create_app() seconds
+_STARTUP_PROBE = """
+import time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app()
+print(t1 - t0, time.perf_counter() - t1)
+"""
+
+
+@perf_cli.command('startup')
+@click.option('--budget-ms', default=1500, show_default=True, help='Maximum import + create_app() time.')
+@click.option('--runs', default=5, show_default=True, help='Fresh interpreters to start; the fastest counts.')
+def check_startup(budget_ms, runs):
+    """Fail if importing the app package and calling create_app() takes longer than the budget."""
+    import os
+    import subprocess
+    import sys
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def run(*flags):
+        return subprocess.run([sys.executable, *flags, '-c', _STARTUP_PROBE], cwd=root,
+                              capture_output=True, text=True, check=True)
+
+    timings = []
+    for _ in range(runs):
+        import_s, create_s = map(float, run().stdout.strip().splitlines()[-1].split())
+        timings.append((import_s + create_s, import_s, create_s))
+    total, import_s, create_s = min(timings)
+    click.echo(f"import {import_s * 1000:.0f} ms + create_app() {create_s * 1000:.0f} ms "
+               f"= {total * 1000:.0f} ms (budget {budget_ms} ms, best of {runs})")
+    if total * 1000 <= budget_ms:
+        return
+
+    click.echo("Over budget. Slowest imports (cumulative ms):")
+    rows = []
+    for line in run('-X', 'importtime').stderr.splitlines():
+        if line.startswith('import time:') and 'cumulative' not in line:
+            _, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            rows.append((int(cumulative_us), name.rstrip()))
+    for cumulative_us, name in sorted(rows, reverse=True)[:15]:
+        click.echo(f"  {cumulative_us / 1000:>8.1f}  {name}")
+    raise SystemExit(1)
+
+
+def register_commands(app):
+    app.cli.add_command(ratings_cli)
+    app.cli.add_command(votes_cli)
+    app.cli.add_command(blocklist_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(recs_cli)
+    app.cli.add_command(media_cli)
+    app.cli.add_command(perf_cli)
@@ -13,8 +13,93 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('DazxPbWNbkAMWZaykrBQj9zvC5hWDFhhFrCLiFyvhN2FYXCm5JNsQa7eErqKKowA9VRsSbTQS5WWKXWsXNDcnpqFQjRgt') or 'your-default-persistent-secret-key-change-in-production'
     PROPAGATE_EXCEPTIONS = True
 
+    # Fail requests that exceed their @query_budget (catches N+1 regressions).
+    # Meant for tests and local development, not production.
+    QUERY_BUDGET_ENFORCED = os.environ.get('QUERY_BUDGET_ENFORCED') == '1'
+
     # Login expiration
     # This cannot be timedelta object directly, so we define it here
     # It cannot also be defined inside the of the .env file as it needs to be a timedelta object
     JWT_ACCESS_TOKEN_EXPIRES = datetime.timedelta(hours=1)
-    JWT_REFRESH_TOKEN_EXPIRES = datetime.timedelta(days=30)
\ No newline at end of file
+    JWT_REFRESH_TOKEN_EXPIRES = datetime.timedelta(days=30)
+
+    # Rate limit storage. The default keeps counters per process, so limits
+    # scale with the number of workers. Use e.g. 'prefetch+sql+sqlite:///ratelimit.db',
+    # 'prefetch+sql+postgresql://...' or 'prefetch+redis://host:6379' to share
+    # them; 'prefetch+' lets each worker reserve up to RATELIMIT_PREFETCH hits
+    # per round trip (see app/ratelimit.py).
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+    RATELIMIT_STORAGE_OPTIONS = (
+        {'prefetch': int(os.environ.get('RATELIMIT_PREFETCH', 16))}
+        if RATELIMIT_STORAGE_URI.startswith('prefetch+') else {}
+    )
+
+    # Response cache for public read endpoints (see app/cache.py). Without a
+    # shared Redis tier, other workers may serve stale data for up to TTL seconds.
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '1') == '1'
+    RESPONSE_CACHE_SIZE = 1024
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 30))
+    RESPONSE_CACHE_REDIS_URL = os.environ.get('RESPONSE_CACHE_REDIS_URL')
+
+    # Movie search (see app/search.py): 'auto' uses the FTS5 table when the
+    # database has one and a per-process in-memory index otherwise. The
+    # in-memory index is rebuilt every SEARCH_REFRESH_INTERVAL seconds to pick
+    # up other workers' writes (0 = only at first use).
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+    SEARCH_REFRESH_INTERVAL = int(os.environ.get('SEARCH_REFRESH_INTERVAL', 60))
+
+    # Seconds between checks for movies added by other workers to the typeahead index
+    SUGGEST_SYNC_INTERVAL = float(os.environ.get('SUGGEST_SYNC_INTERVAL', 5.0))
+
+    # Uploaded images (see app/media.py). MEDIA_ROOT defaults to static/uploads.
+    MEDIA_ROOT = os.environ.get('MEDIA_ROOT')
+    # Set to the prefix of an `internal` nginx location aliased to MEDIA_ROOT
+    # (e.g. '/_media/') to have nginx send the files via X-Accel-Redirect
+    MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT')
+    MEDIA_MAX_UPLOAD_BYTES = int(os.environ.get('MEDIA_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+    # Threads writing resized variants in the background (0 = during the request)
+    MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', 2))
+    # Unreferenced uploads younger than this are kept by `flask media gc`
+    MEDIA_GC_GRACE_SECONDS = int(os.environ.get('MEDIA_GC_GRACE_SECONDS', 24 * 3600))
+    # Seconds between background garbage collections; 0 disables (use the CLI/cron)
+    MEDIA_GC_INTERVAL = int(os.environ.get('MEDIA_GC_INTERVAL', 0))
+    # Werkzeug stops reading a request body past this; leaves room for the other form fields
+    MAX_CONTENT_LENGTH = MEDIA_MAX_UPLOAD_BYTES + 1024 * 1024
+
+    # Admin SQL endpoint (see app/admin.py). Requests may ask for a lower
+    # limit/timeout, not a higher one. Streamed results (format 'ndjson' or
+    # 'csv') are read ADMIN_SQL_BATCH_SIZE rows at a time.
+    ADMIN_SQL_MAX_ROWS = int(os.environ.get('ADMIN_SQL_MAX_ROWS', 10000))
+    ADMIN_SQL_STREAM_MAX_ROWS = int(os.environ.get('ADMIN_SQL_STREAM_MAX_ROWS', 1000000))
+    ADMIN_SQL_BATCH_SIZE = 1000
+    ADMIN_SQL_TIMEOUT = float(os.environ.get('ADMIN_SQL_TIMEOUT', 30))
+
+    # Admin audit log (see app/audit.py): JSON lines written by a background
+    # thread. AUDIT_LOG_FSYNC is 'always' (every batch), 'interval' (at most
+    # every AUDIT_LOG_FSYNC_INTERVAL seconds) or 'never'. The file is rotated
+    # past AUDIT_LOG_MAX_BYTES and every AUDIT_LOG_ROTATE_SECONDS (0 = never),
+    # keeping AUDIT_LOG_BACKUPS old files.
+    AUDIT_LOG_PATH = os.environ.get('AUDIT_LOG_PATH', 'admin_audit.log')
+    AUDIT_LOG_QUEUE_SIZE = int(os.environ.get('AUDIT_LOG_QUEUE_SIZE', 10000))
+    AUDIT_LOG_FSYNC = os.environ.get('AUDIT_LOG_FSYNC', 'interval')
+    AUDIT_LOG_FSYNC_INTERVAL = float(os.environ.get('AUDIT_LOG_FSYNC_INTERVAL', 1.0))
+    AUDIT_LOG_MAX_BYTES = int(os.environ.get('AUDIT_LOG_MAX_BYTES', 50 * 1024 * 1024))
+    AUDIT_LOG_ROTATE_SECONDS = int(os.environ.get('AUDIT_LOG_ROTATE_SECONDS', 24 * 3600))
+    AUDIT_LOG_BACKUPS = int(os.environ.get('AUDIT_LOG_BACKUPS', 10))
+
+    # Password hashing (see app/hashing.py). Changing BCRYPT_LOG_ROUNDS
+    # upgrades existing hashes as users log in.
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+    # Jobs allowed to wait for or run on the pool before requests get a 503
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.environ.get('PASSWORD_HASH_QUEUE_DEPTH', PASSWORD_HASH_WORKERS * 4))
+    PASSWORD_HASH_TIMEOUT = 10
+
+    # JWT blocklist cache (see app/blocklist.py). A token revoked in another
+    # worker process is rejected here within BLOCKLIST_SYNC_INTERVAL seconds.
+    BLOCKLIST_SYNC_INTERVAL = float(os.environ.get('BLOCKLIST_SYNC_INTERVAL', 1.0))
+    BLOCKLIST_RECENT_SIZE = 10000
+    BLOCKLIST_BLOOM_CAPACITY = 100000
+    BLOCKLIST_BLOOM_ERROR_RATE = 0.001
+    # Seconds between background prunes of expired entries; 0 disables (use the CLI/cron)
+    BLOCKLIST_PRUNE_INTERVAL = int(os.environ.get('BLOCKLIST_PRUNE_INTERVAL', 0))
\ No newline at end of file
@@ -2,10 +2,16 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
-from flask_marshmallow import Marshmallow
-from flask_migrate import Migrate
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from .blocklist import TokenBlocklist
+from .hashing import PasswordHasher
+from .cache import ResponseCache
+from .search import SearchIndex
+from .suggest import SuggestIndex
+from .media import MediaStore
+from .audit import AuditLog
+from . import ratelimit  # noqa: F401  registers the sql+/prefetch+ storage schemes
 
 # Initialize extensions here
 # create initial instances without app context e.g.
@@ -14,8 +20,39 @@ from flask_limiter.util import get_remote_address
 db = SQLAlchemy()
 jwt = JWTManager()
 bcrypt = Bcrypt()
-ma = Marshmallow()
-migrate = Migrate()
 
-# Rate limiting (Stored in memory for dev)
-limiter = Limiter(key_func=get_remote_address)
\ No newline at end of file
+# Cached view of the token_blacklist table used by the JWT revocation check
+blocklist = TokenBlocklist()
+
+# Runs bcrypt in a bounded process pool, off the request thread
+password_hasher = PasswordHasher()
+
+# Cache for public GET responses, invalidated by tag from the write paths
+response_cache = ResponseCache()
+
+# Full-text movie search (FTS5 table on SQLite, in-memory index otherwise)
+search_index = SearchIndex()
+
+# In-memory typeahead over titles, directors and cast names
+suggest_index = SuggestIndex()
+
+# Uploaded posters and avatars, content-addressed, with resized variants
+media = MediaStore()
+
+# Admin audit trail, appended as JSON lines by a background writer thread
+audit_log = AuditLog()
+
+# Rate limiting (in memory for dev, set RATELIMIT_STORAGE_URI to share across workers)
+limiter = Limiter(key_func=get_remote_address)
+
+
+def __getattr__(name):
+    # Flask-Migrate imports alembic, which takes longer than every other
+    # extension put together. Workers never run migrations, so `migrate` is
+    # only created when something imports it (see init_migrations).
+    if name == 'migrate':
+        global migrate
+        from flask_migrate import Migrate
+        migrate = Migrate()
+        return migrate
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
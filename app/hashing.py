@@ -0,0 +1,118 @@
+# app/hashing.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from types import SimpleNamespace
+from flask_bcrypt import Bcrypt
+
+
+class HasherOverloaded(Exception):
+    """Raised when the hashing pool is saturated; mapped to a 503 response."""
+
+
+# Runs inside the pool processes. Each call builds a Flask-Bcrypt instance
+# from plain settings so hashes stay byte-for-byte compatible with the
+# `bcrypt` extension used elsewhere.
+def _bcrypt_for(settings):
+    hasher = Bcrypt()
+    hasher.init_app(SimpleNamespace(config=settings))
+    return hasher
+
+
+def _generate(settings, password):
+    return _bcrypt_for(settings).generate_password_hash(password).decode('utf-8')
+
+
+def _check(settings, pw_hash, password):
+    return _bcrypt_for(settings).check_password_hash(pw_hash, password)
+
+
+# bcrypt is deliberately slow CPU work. Running it on the request thread lets
+# a burst of logins starve every other endpoint on the worker, so hashing and
+# verification go through a small dedicated process pool instead. At most
+# PASSWORD_HASH_QUEUE_DEPTH jobs may be queued or running; beyond that we
+# refuse immediately (HasherOverloaded -> 503) rather than letting requests
+# pile up behind the pool.
+class PasswordHasher:
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))
+        app.config.setdefault('PASSWORD_HASH_QUEUE_DEPTH', app.config['PASSWORD_HASH_WORKERS'] * 4)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+
+        self.settings = {
+            'BCRYPT_LOG_ROUNDS': app.config['BCRYPT_LOG_ROUNDS'],
+            'BCRYPT_HASH_PREFIX': app.config.get('BCRYPT_HASH_PREFIX', '2b'),
+            'BCRYPT_HANDLE_LONG_PASSWORDS': app.config.get('BCRYPT_HANDLE_LONG_PASSWORDS', False),
+        }
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(max(app.config['PASSWORD_HASH_QUEUE_DEPTH'], 1))
+        self.shutdown()
+
+    def _get_executor(self):
+        # Created lazily, and re-created after a fork, so each pre-forked
+        # server worker gets its own pool instead of inheriting a dead one.
+        # By now this process runs other threads (server, media, audit log),
+        # and forking it could copy a lock one of them holds into the pool
+        # processes. They are started from a clean forkserver instead (spawn
+        # where there is none); the jobs only need this module.
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload([__name__])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        # PASSWORD_HASH_WORKERS = 0 hashes inline (handy for tests and scripts)
+        if not self.workers:
+            return fn(self.settings, *args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherOverloaded("Password hashing queue is full")
+        try:
+            future = self._get_executor().submit(fn, self.settings, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is freed when the job finishes, not when we stop waiting
+        # for it, so a timed-out job still counts against the queue depth
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherOverloaded("Password hashing timed out")
+
+    def generate(self, password):
+        return self._run(_generate, password)
+
+    def check(self, pw_hash, password):
+        return self._run(_check, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """True if the hash was made with a different work factor than configured."""
+        try:
+            rounds = int(pw_hash.split('$')[2])
+        except (AttributeError, IndexError, ValueError):
+            return True
+        return rounds != self.settings['BCRYPT_LOG_ROUNDS']
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._executor_pid = None
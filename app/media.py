@@ -0,0 +1,382 @@
+# app/media.py
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, make_response, send_file
+
+CHUNK_SIZE = 64 * 1024
+
+# Stored files never change, so browsers and proxies may keep them this long
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Pillow format -> file extension of the stored original
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+# Resized copies made for each kind of upload: name -> (width, height, crop).
+# Posters are scaled to fit the box; avatars are cropped to a square. Sizes
+# are about twice the largest CSS size each is shown at, for high-DPI screens.
+VARIANTS = {
+    'poster': {'poster': (800, 1200, False), 'card': (400, 600, False)},
+    'avatar': {'avatar': (320, 320, True), 'avatar_sm': (80, 80, True)},
+}
+
+# Every variant is written in each of these: extension -> (Pillow format, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_STORED_NAME = re.compile(r'(?:^|/)([0-9a-f]{64})\.(?:jpg|png|gif|webp)$')
+_SHARD = re.compile(r'^[0-9a-f]{2}$')
+# A stored original or one of its variants, relative to the media root
+_MEDIA_FILE = re.compile(r'^([0-9a-f]{2})/(\1[0-9a-f]{62})((?:\.[a-z_]+)?\.(?:jpg|png|gif|webp))$')
+
+
+class UploadRejected(Exception):
+    """The upload is not an acceptable image; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+    @classmethod
+    def too_large(cls, max_bytes):
+        return cls(f"Image is larger than {max_bytes / (1024 * 1024):.3g} MB", 413)
+
+
+def variant_urls(url, kind):
+    """{variant: {'webp': url, 'jpg': url}} for an uploaded original, {} for any other URL.
+
+    Variant names are derived from the original's, so nothing beyond the
+    original URL has to be stored. External links and uploads made before
+    content addressing have no variants.
+    """
+    match = _STORED_NAME.search(url or '')
+    if not match:
+        return {}
+    base = url[:match.start(1)] + match.group(1)
+    return {
+        name: {ext: f'{base}.{name}.{ext}' for ext in VARIANT_FORMATS}
+        for name in VARIANTS[kind]
+    }
+
+
+def _resize(image, width, height, crop):
+    from PIL import Image, ImageOps
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)  # never upscales
+    return image
+
+
+def write_variants(path, kind):
+    """Write the missing variants of the original at `path`; returns how many were written."""
+    from PIL import Image, ImageOps
+    base = path.rsplit('.', 1)[0]
+    missing = [
+        (name, size, ext) for name, size in VARIANTS[kind].items() for ext in VARIANT_FORMATS
+        if not os.path.exists(f'{base}.{name}.{ext}')
+    ]
+    if not missing:
+        return 0
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')  # first frame of a GIF
+    resized = {}
+    for name, (width, height, crop), ext in missing:
+        if name not in resized:
+            resized[name] = _resize(image, width, height, crop)
+        pillow_format, options = VARIANT_FORMATS[ext]
+        # Written next to the target and renamed, so a reader never sees half a file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.variant-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                resized[name].save(out, pillow_format, **options)
+            os.replace(tmp_path, f'{base}.{name}.{ext}')
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return len(missing)
+
+
+# Uploaded images (movie posters and profile pictures).
+#
+# An upload is streamed to a temporary file in CHUNK_SIZE pieces, hashed on
+# the way and abandoned as soon as it passes MEDIA_MAX_UPLOAD_BYTES. Once
+# Pillow has confirmed it is an image, it is renamed to its SHA-256
+# (<root>/ab/abcd....jpg), so the same picture uploaded twice is stored
+# once. Files are never modified after that, so their URLs can be cached
+# forever.
+#
+# Resized WebP and JPEG variants (VARIANTS) are written next to the original
+# by a small thread pool after the request has returned; Pillow releases the
+# GIL while resizing and encoding. Their URLs are known up front
+# (variant_urls), and pages fall back to the original until they exist.
+class MediaStore:
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._collector = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MEDIA_ROOT', None)
+        app.config.setdefault('MEDIA_URL', '/media')
+        app.config.setdefault('MEDIA_ACCEL_REDIRECT', None)
+        app.config.setdefault('MEDIA_MAX_UPLOAD_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('MEDIA_MAX_PIXELS', 40_000_000)
+        app.config.setdefault('MEDIA_WORKERS', 2)
+        app.config.setdefault('MEDIA_GC_GRACE_SECONDS', 24 * 3600)
+        app.config.setdefault('MEDIA_GC_INTERVAL', 0)
+        self.root = app.config['MEDIA_ROOT'] or os.path.join(app.static_folder, 'uploads')
+        self.url = app.config['MEDIA_URL'].rstrip('/')
+        self.max_bytes = app.config['MEDIA_MAX_UPLOAD_BYTES']
+        self.max_pixels = app.config['MEDIA_MAX_PIXELS']
+        self.workers = app.config['MEDIA_WORKERS']
+        self.accel_redirect = app.config['MEDIA_ACCEL_REDIRECT']
+        self.gc_grace_seconds = app.config['MEDIA_GC_GRACE_SECONDS']
+        self.logger = app.logger
+        self.shutdown()
+        if app.config['MEDIA_GC_INTERVAL'] > 0:
+            self.start_collector(app, app.config['MEDIA_GC_INTERVAL'])
+
+    def relative_path(self, digest, ext):
+        return f'{digest[:2]}/{digest}.{ext}'
+
+    def _receive(self, stream):
+        """Copy `stream` to a temporary file under the root; returns (sha256 hex, temp path)."""
+        tmp_dir = os.path.join(self.root, '.incoming')
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadRejected.too_large(self.max_bytes)
+                    digest.update(chunk)
+                    out.write(chunk)
+            if not size:
+                raise UploadRejected("Uploaded file is empty")
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return digest.hexdigest(), tmp_path
+
+    def _image_extension(self, path):
+        from PIL import Image, UnidentifiedImageError
+        try:
+            # Only reads the header; formats= keeps Pillow to the decoders we accept
+            with Image.open(path, formats=list(FORMATS)) as image:
+                pillow_format, (width, height) = image.format, image.size
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            raise UploadRejected("Uploaded file must be a JPEG, PNG, GIF or WebP image")
+        if width * height > self.max_pixels:
+            raise UploadRejected("Image dimensions are too large")
+        return FORMATS[pillow_format]
+
+    def save(self, upload, kind):
+        """Store an uploaded image (a werkzeug FileStorage) and queue its variants.
+
+        Returns the URL of the original. Raises UploadRejected for anything
+        that is not an acceptable image.
+        """
+        digest, tmp_path = self._receive(upload.stream)
+        try:
+            ext = self._image_extension(tmp_path)
+            relative = self.relative_path(digest, ext)
+            path = os.path.join(self.root, relative)
+            if os.path.exists(path):
+                os.unlink(tmp_path)  # same content already stored
+                os.utime(path)  # restart its garbage collection grace period
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        # Also for duplicates: the earlier upload may have been of another kind
+        self.submit_variants(path, kind)
+        return f'{self.url}/{relative}'
+
+    def _get_executor(self):
+        # Created lazily and re-created after a fork, like the password hashing pool
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='media')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _write_variants(self, path, kind):
+        try:
+            write_variants(path, kind)
+        except Exception:
+            self.logger.exception("Could not write image variants for %s", path)
+
+    def submit_variants(self, path, kind):
+        # MEDIA_WORKERS = 0 writes them inline (handy for tests and scripts)
+        if not self.workers:
+            self._write_variants(path, kind)
+        else:
+            self._get_executor().submit(self._write_variants, path, kind)
+
+    def path_for_url(self, url):
+        """Filesystem path of an uploaded original given its URL, or None for other URLs."""
+        match = _STORED_NAME.search(url or '')
+        if not match:
+            return None
+        # Uploads made before the media route have /static/uploads/ URLs
+        relative = url[match.start(1) - 3:]
+        if not _MEDIA_FILE.match(relative):
+            return None
+        return os.path.join(self.root, relative)
+
+    def _referenced(self):
+        """(content hashes, other relative paths) of the uploads that movies and users point at."""
+        from .extensions import db
+        from .models import Movie, User
+        digests, names = set(), set()
+        legacy_prefix = '/static/uploads/'
+        for column in (Movie.image_url, User.profile_picture):
+            for (url,) in db.session.query(column).filter(column.isnot(None)).yield_per(10000):
+                match = _STORED_NAME.search(url)
+                if match:
+                    digests.add(match.group(1))
+                elif url.startswith(legacy_prefix) and '/' not in url[len(legacy_prefix):]:
+                    names.add(url[len(legacy_prefix):])  # timestamped upload from before content addressing
+        return digests, names
+
+    def collect_garbage(self, grace_seconds=None, dry_run=False):
+        """Delete stored files that no movie or user refers to and that are older than the grace period.
+
+        Variants go with their original. Leftover temporary files from
+        interrupted uploads are removed too. References are read before the
+        directory is walked, so a file that gains a reference mid-run was
+        written or touched (see save) after that point and is still inside
+        its grace period. Returns counts and byte totals of what was scanned,
+        kept and deleted.
+        """
+        grace = self.gc_grace_seconds if grace_seconds is None else grace_seconds
+        digests, names = self._referenced()
+        cutoff = time.time() - grace
+        report = {'scanned': 0, 'scanned_bytes': 0, 'deleted': 0, 'reclaimed_bytes': 0}
+
+        def visit(entry, keep):
+            # scandir already knows each entry's type; only files pay for a stat()
+            stat = entry.stat(follow_symlinks=False)
+            report['scanned'] += 1
+            report['scanned_bytes'] += stat.st_size
+            if keep or stat.st_mtime > cutoff:
+                return
+            if not dry_run:
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    return
+            report['deleted'] += 1
+            report['reclaimed_bytes'] += stat.st_size
+
+        if not os.path.isdir(self.root):
+            return report
+        with os.scandir(self.root) as top:
+            for entry in top:
+                if entry.is_file(follow_symlinks=False):
+                    if not entry.name.startswith('.'):  # .gc.lock, .gitkeep
+                        visit(entry, entry.name in names)
+                elif entry.is_dir(follow_symlinks=False) and (entry.name == '.incoming' or _SHARD.match(entry.name)):
+                    with os.scandir(entry.path) as shard:
+                        for item in shard:
+                            if item.is_file(follow_symlinks=False):
+                                digest = item.name.split('.', 1)[0]
+                                keep = entry.name != '.incoming' and digest in digests
+                                visit(item, keep)
+        return report
+
+    def start_collector(self, app, interval):
+        """Run collect_garbage every `interval` seconds on a daemon thread.
+
+        Every worker process starts one; an flock on <root>/.gc.lock makes
+        the others skip a round while one is already walking the directory.
+        """
+        if self._collector is not None:
+            return
+
+        def run():
+            import fcntl
+            while True:
+                time.sleep(interval)
+                try:
+                    os.makedirs(self.root, exist_ok=True)
+                    with open(os.path.join(self.root, '.gc.lock'), 'w') as lock:
+                        try:
+                            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            continue
+                        with app.app_context():
+                            report = self.collect_garbage()
+                    if report['deleted']:
+                        app.logger.info("Media GC deleted %d file(s), %d bytes",
+                                        report['deleted'], report['reclaimed_bytes'])
+                except Exception as e:
+                    app.logger.warning("Media GC failed: %s", e)
+
+        self._collector = threading.Thread(target=run, name='media-gc', daemon=True)
+        self._collector.start()
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=wait)
+            self._executor = None
+            self._executor_pid = None
+
+
+# Serves stored uploads. Their names are their content hashes, so a response
+# can be cached forever (Cache-Control: immutable) and revalidated by name
+# alone. Flask's send_file answers Range and If-None-Match / If-Modified-Since
+# requests and hands the file to the server's wsgi.file_wrapper, which
+# gunicorn implements with sendfile(2). With MEDIA_ACCEL_REDIRECT set (the
+# prefix of an `internal` nginx location aliased to the media root) the body
+# is left to the proxy entirely via X-Accel-Redirect.
+media_bp = Blueprint('media', __name__)
+
+
+@media_bp.route('/media/<path:name>', methods=['GET'])
+def serve_media(name):
+    from .extensions import media
+    match = _MEDIA_FILE.match(name)
+    path = os.path.join(media.root, name) if match else None
+    if path is None or not os.path.isfile(path):
+        # Variants appear shortly after an upload; don't let anyone cache the miss
+        response = make_response(('', 404))
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    if media.accel_redirect:
+        response = make_response(('', 200))
+        response.headers['X-Accel-Redirect'] = media.accel_redirect.rstrip('/') + '/' + name
+        response.mimetype = _mimetype(name)
+    else:
+        response = send_file(path, mimetype=_mimetype(name), conditional=True,
+                             etag=match.group(2) + match.group(3), max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def _mimetype(name):
+    ext = name.rsplit('.', 1)[1]
+    return 'image/jpeg' if ext == 'jpg' else f'image/{ext}'
@@ -1,6 +1,7 @@
 # app/models.py
 from datetime import datetime, timedelta
-from .extensions import db, bcrypt
+from .extensions import db, password_hasher
+from .media import variant_urls
 import jwt
 from flask import current_app
 
@@ -9,7 +10,15 @@ class TokenBlacklist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     jti = db.Column(db.String(255), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    # Value of blocklist_version.version taken by the revoking transaction
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+
+class BlocklistVersion(db.Model):
+    """Single-row counter bumped by every revocation, see blocklist.py."""
+    __tablename__ = 'blocklist_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -30,11 +39,19 @@ class User(db.Model):
         if len(password) < 8:
             return False
 
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.generate(password)
         return True
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
+
+    def rehash_password_if_needed(self, password):
+        # Called after a successful login: upgrades hashes made with an old
+        # BCRYPT_LOG_ROUNDS. Returns True if the hash changed.
+        if not password_hasher.needs_rehash(self.password_hash):
+            return False
+        self.password_hash = password_hasher.generate(password)
+        return True
 
     def to_dict(self):
         return {
@@ -43,6 +60,7 @@ class User(db.Model):
             'email': self.email,
             'bio': self.bio or '',
             'profile_picture': self.profile_picture,
+            'profile_picture_variants': variant_urls(self.profile_picture, 'avatar'),
             'favorite_genres': self.favorite_genres or ''
         }
 
@@ -62,14 +80,49 @@ class Movie(db.Model):
     # Track who created the movie
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     creator = db.relationship('User', backref='created_movies', lazy=True)
+
+    # Denormalized rating aggregates, kept in sync by the review write paths
+    # (see aggregates.py) so listing movies never has to load review rows.
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_1_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_2_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_3_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_4_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_5_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # rating_sum / rating_count, stored so "top rated" can be served from an index
+    rating_avg = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    # Bayesian average: the mean pulled towards a prior until a movie has
+    # enough ratings (see aggregates.py). What "top rated" ranks by.
+    rating_score = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    # Reviews created within the trending window, kept in step with
+    # movie_review_buckets by the review write paths
+    trending_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set by apply_review_rating when the movie's ratings change; cleared once
+    # its row in movie_neighbors has been recomputed (see recommend.py)
+    neighbors_stale = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     
     reviews = db.relationship('Review', backref='movie', lazy=True, cascade="all, delete-orphan")
 
+    # Indexes backing the sort orders and filters of GET /api/movies
+    __table_args__ = (
+        db.Index('ix_movies_rating_avg_id', 'rating_avg', 'id'),
+        db.Index('ix_movies_title_id', 'title', 'id'),
+        db.Index('ix_movies_release_date', 'release_date'),
+        db.Index('ix_movies_director', 'director'),
+        db.Index('ix_movies_neighbors_stale', 'neighbors_stale'),
+        db.Index('ix_movies_rating_score_id', 'rating_score', 'id'),
+        db.Index('ix_movies_rating_count_id', 'rating_count', 'id'),
+        db.Index('ix_movies_trending_count_id', 'trending_count', 'id'),
+    )
+
     def average_rating(self):
-        if not self.reviews:
+        if not self.rating_count:
             return "N/A"
-        total = sum([r.rating for r in self.reviews])
-        return round(total / len(self.reviews), 1)
+        return round(self.rating_sum / self.rating_count, 1)
+
+    def rating_histogram(self):
+        return {str(i): getattr(self, f'rating_{i}_count') or 0 for i in range(1, 6)}
 
     def to_dict(self):
         creator_info = None
@@ -77,7 +130,8 @@ class Movie(db.Model):
             creator_info = {
                 'id': self.creator.id,
                 'username': self.creator.username,
-                'profile_picture': self.creator.profile_picture
+                'profile_picture': self.creator.profile_picture,
+                'profile_picture_variants': variant_urls(self.creator.profile_picture, 'avatar'),
             }
         
         return {
@@ -86,10 +140,12 @@ class Movie(db.Model):
             'description': self.description,
             'release_date': self.release_date.isoformat() if self.release_date else None,
             'image_url': self.image_url,
+            'image_variants': variant_urls(self.image_url, 'poster'),
             'director': self.director,
             'cast': self.cast,
             'average_rating': self.average_rating(),
-            'review_count': len(self.reviews),
+            'review_count': self.rating_count or 0,
+            'rating_histogram': self.rating_histogram(),
             'creator': creator_info,
             'user_id': self.user_id
         }
@@ -104,11 +160,28 @@ class Review(db.Model):
     
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False)
+
+    # Materialized vote tallies, updated inside the like/dislike toggle transaction
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    dislikes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Add relationship to access username easily
     user = db.relationship('User', backref='user_reviews', lazy=True)
     likes = db.relationship('ReviewLike', backref='review', lazy=True, cascade="all, delete-orphan")
 
+    # Index/constraint pack for the review hot paths (migration 0003)
+    __table_args__ = (
+        # One review per user per movie; rate_movie relies on this
+        db.Index('uq_reviews_user_movie', 'user_id', 'movie_id', unique=True),
+        # Per-user review history (newest first, keyset paginated)
+        db.Index('ix_reviews_user_id_created_at', 'user_id', 'created_at', 'id'),
+        # A movie's review list, newest first
+        db.Index('ix_reviews_movie_id_created_at', 'movie_id', 'created_at', 'id'),
+        # Top reviews per movie for the home page cards
+        db.Index('ix_reviews_movie_id_likes_count', 'movie_id', 'likes_count'),
+        db.Index('ix_reviews_created_at', 'created_at'),
+    )
+
 class ReviewLike(db.Model):
     __tablename__ = 'review_likes'
     id = db.Column(db.Integer, primary_key=True)
@@ -119,4 +192,26 @@ class ReviewLike(db.Model):
     
     user = db.relationship('User', backref='review_likes', lazy=True)
     
-    __table_args__ = (db.UniqueConstraint('review_id', 'user_id', name='unique_user_review_like'),)
\ No newline at end of file
+    __table_args__ = (
+        db.UniqueConstraint('review_id', 'user_id', name='unique_user_review_like'),
+        db.Index('ix_review_likes_review_id_is_like', 'review_id', 'is_like'),
+    )
+
+class MovieNeighbor(db.Model):
+    """Precomputed item-item similarity: the top neighbors of each rated movie."""
+    __tablename__ = 'movie_neighbors'
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), primary_key=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('movies.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+class MovieReviewBucket(db.Model):
+    """Reviews created per movie per hour, for the hours still inside the trending window."""
+    __tablename__ = 'movie_review_buckets'
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), primary_key=True)
+    # Hours since the Unix epoch (UTC)
+    hour = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_movie_review_buckets_hour', 'hour'),
+    )
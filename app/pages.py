@@ -0,0 +1,76 @@
+# app/pages.py
+import gzip
+import hashlib
+import threading
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional: pages are still served gzipped without it
+    brotli = None
+
+
+class _RenderedPage:
+    __slots__ = ('bodies', 'etag')
+
+    def __init__(self, html):
+        raw = html.encode('utf-8')
+        self.etag = hashlib.sha256(raw).hexdigest()[:32]
+        self.bodies = {'identity': raw, 'gzip': gzip.compress(raw, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(raw, quality=11)
+
+
+# The HTML pages take no per-request variables, so rendering them through
+# render_template_string on every hit only re-parses the same template.
+# Each registered page is put into the layout, compiled, rendered and
+# compressed once, on its first request in a worker (keeping that work off
+# the boot path), then kept as identity/gzip/brotli bytes with a strong ETag
+# per encoding. Later requests just pick an encoding and either send the
+# bytes or a 304.
+class PageRegistry:
+
+    def __init__(self, layout='{{ content|safe }}'):
+        self.layout = layout
+        self._sources = {}
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, content):
+        self._sources[name] = content
+
+    def _page(self, name):
+        page = self._pages.get(name)
+        if page is None:
+            with self._lock:
+                page = self._pages.get(name)
+                if page is None:
+                    source = self.layout.replace('{{ content|safe }}', self._sources[name])
+                    html = current_app.jinja_env.from_string(source).render()
+                    page = self._pages[name] = _RenderedPage(html)
+        return page
+
+    def _pick_encoding(self, page):
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in page.bodies and accepted[encoding]:
+                return encoding
+        return 'identity'
+
+    def response(self, name):
+        page = self._page(name)
+        encoding = self._pick_encoding(page)
+        etag = page.etag if encoding == 'identity' else f"{page.etag}-{encoding}"
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(page.bodies[encoding], mimetype='text/html')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        # Always revalidate; unchanged pages cost a 304 with no body
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
@@ -0,0 +1,54 @@
+# app/pagination.py
+import base64
+import json
+import math
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Cursors are opaque to clients: the sort key of the last row on the page
+# plus its id as a tie-breaker, JSON-encoded and base64'd.
+def encode_cursor(*values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _is_a(value, kind):
+    # JSON has no int/float distinction worth trusting, and True is an int
+    if isinstance(value, bool):
+        return False
+    if kind is float:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, kind)
+
+
+def decode_cursor(cursor, size, types=None):
+    """Decode a cursor produced by encode_cursor, expecting `size` values.
+
+    `types` gives the expected Python type (int, float or str) of each
+    value; anything else in the cursor is rejected before it reaches a query.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Invalid cursor")
+    if types is not None and not all(_is_a(value, kind) for value, kind in zip(values, types)):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def page_size(args, default=DEFAULT_PAGE_SIZE):
+    """Read ?limit= from the request args, clamped to 1..MAX_PAGE_SIZE."""
+    try:
+        limit = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, MAX_PAGE_SIZE))
@@ -0,0 +1,82 @@
+# app/querycount.py
+from contextlib import contextmanager
+from flask import g, has_request_context, request, current_app
+from sqlalchemy import event
+from .extensions import db
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# Views declare a fixed number of SQL statements they may run per request.
+# The budget is a constant, so an endpoint whose query count grows with the
+# size of its result (an N+1) blows it as soon as there is more than a
+# handful of rows. Place it directly under @main_bp.route(...).
+def query_budget(max_queries):
+    def decorator(view):
+        view._query_budget = max_queries
+        return view
+    return decorator
+
+
+@contextmanager
+def count_queries():
+    """Count statements executed on the app's engine inside the block.
+
+    Usage: `with count_queries() as counter: ...; counter['count']`.
+    """
+    counter = {'count': 0}
+
+    def on_execute(*args):
+        counter['count'] += 1
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+
+
+@contextmanager
+def unbudgeted():
+    """Leave statements run inside the block out of the request's budget.
+
+    For one-off work such as warming a per-process cache on first use, which
+    is not what a view's budget is about.
+    """
+    paused = g.pop('query_count', None) if has_request_context() else None
+    try:
+        yield
+    finally:
+        if paused is not None:
+            g.query_count = paused
+
+
+def init_query_budgets(app):
+    """Enforce @query_budget limits when QUERY_BUDGET_ENFORCED is set (tests/dev)."""
+    if not app.config.get('QUERY_BUDGET_ENFORCED'):
+        return
+
+    def on_execute(*args):
+        if has_request_context() and 'query_count' in g:
+            g.query_count += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', on_execute)
+
+    @app.before_request
+    def start_query_count():
+        g.query_count = 0
+
+    @app.after_request
+    def check_query_budget(response):
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, '_query_budget', None)
+        if budget is not None and g.get('query_count', 0) > budget:
+            raise QueryBudgetExceeded(
+                f"{request.method} {request.path} ran {g.query_count} queries "
+                f"(budget {budget}); check for lazy loads in a loop"
+            )
+        return response
@@ -0,0 +1,206 @@
+# app/queryplans.py
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# Matches SQLite plan lines that read a table without an index constraint:
+# "SCAN reviews" (a full table scan) and "SCAN movies USING INDEX ..." (a
+# walk of a whole index), as opposed to "SEARCH reviews USING INDEX ...".
+_FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX \w+)?$')
+_ALIAS = re.compile(r'\b(\w+) AS (\w+)\b')
+
+
+def _is_bounded_walk(statement, plan):
+    # "ORDER BY <indexed columns> LIMIT n" with nothing to filter shows up as
+    # a SCAN too, but SQLite walks the index in order and stops after n rows.
+    # A WHERE would make it skip rows it cannot count on finding, and a sort
+    # into a temp b-tree means every row gets read first.
+    upper = statement.upper()
+    return ('LIMIT' in upper and ' WHERE ' not in upper
+            and not any('TEMP B-TREE' in line for line in plan))
+
+
+def _scenario(client):
+    """Drive every API endpoint once so their SQL can be captured."""
+    def register(name):
+        client.post('/api/auth/register', json={'username': name, 'email': f'{name}@example.com', 'password': 'password123'})
+        token = client.post('/api/auth/login', json={'email': f'{name}@example.com', 'password': 'password123'}).get_json()['access_token']
+        return {'Authorization': f'Bearer {token}'}
+
+    alice, bob = register('alice'), register('bob')
+    for i in range(3):
+        client.post('/api/movies', headers=alice, json={
+            'title': f'Movie {i}', 'description': 'Plot', 'release_date': f'200{i}-01-01', 'director': 'Someone'
+        })
+    client.post('/api/movies/1/rate', headers=alice, json={'rating': 4, 'content': 'Good'})
+    client.post('/api/movies/1/rate', headers=alice, json={'rating': 4, 'content': 'Duplicate'})
+    client.post('/api/movies/1/rate', headers=bob, json={'rating': 2, 'content': 'Meh'})
+    client.put('/api/reviews/2', headers=bob, json={'rating': 3, 'content': 'Better'})
+    client.post('/api/reviews/1/like', headers=bob, json={'is_like': True})
+    client.post('/api/reviews/1/like', headers=bob, json={'is_like': False})
+    client.post('/api/reviews/votes:batch', headers=alice, json={'review_ids': [1, 2]})
+
+    for sort in ('rating', 'title', 'recent'):
+        page = client.get(f'/api/movies?sort={sort}&limit=1').get_json()
+        client.get(f"/api/movies?sort={sort}&limit=1&cursor={page['next_cursor']}")
+    client.get('/api/movies?min_rating=3&release_year=2000&director=Someone')
+    client.get('/api/movies?q=movie')
+    client.get('/api/movies/cards')
+    for kind in ('top_rated', 'most_reviewed', 'trending'):
+        page = client.get(f'/api/leaderboards/{kind}?limit=1').get_json()
+        client.get(f"/api/leaderboards/{kind}?limit=1&cursor={page['next_cursor'] or ''}")
+    client.get('/api/movies/suggest?prefix=mov')
+    page = client.get('/api/search?q=movie&limit=1&top_reviews=2').get_json()
+    client.get('/api/search?q=some*&limit=1&cursor=' + (page['next_cursor'] or ''))
+    client.get('/api/movies/1')
+    client.get('/api/movies/1/reviews', headers=alice)
+    client.get('/api/movies/1/similar')
+    page = client.get('/api/users/2/reviews?limit=1').get_json()
+    client.get('/api/users/1/reviews?limit=1&cursor=' + (page['next_cursor'] or ''))
+    client.get('/api/users/1')
+    client.get('/api/users/1/recommendations')
+    client.get('/api/users/2/recommendations')
+    client.get('/api/users/profile', headers=alice)
+    client.put('/api/users/profile/update', headers=alice, json={'bio': 'Hi'})
+    client.get('/api/reviews/1/votes?user_id=2')
+    client.delete('/api/reviews/2', headers=bob)
+    client.post('/api/auth/logout', headers=bob)
+
+
+@contextmanager
+def _scratch_app(config_class):
+    """An app on a throwaway SQLite DB migrated to head, with caching and rate limits off."""
+    from flask_migrate import upgrade
+    from . import create_app, init_migrations
+    from .extensions import db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class ScratchConfig(config_class):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'scratch.db')
+            RATELIMIT_ENABLED = False
+            RESPONSE_CACHE_ENABLED = False
+            PASSWORD_HASH_WORKERS = 0
+            BCRYPT_LOG_ROUNDS = 4
+
+        app = create_app(ScratchConfig)
+        # Build the schema the way production does, so the FTS5 table exists too
+        init_migrations(app)
+        with app.app_context():
+            upgrade()
+        try:
+            yield app
+        finally:
+            with app.app_context():
+                db.engine.dispose()
+
+
+def explain_api_queries(config_class):
+    """Run the API against a scratch SQLite DB and EXPLAIN every statement.
+
+    Returns a list of (sql, plan lines, full-scanned tables) tuples.
+    """
+    from .extensions import db
+
+    with _scratch_app(config_class) as app:
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')) and not executemany:
+                statements.append((statement, parameters))
+
+        with app.app_context():
+            engine = db.engine
+            tables = set(db.metadata.tables)
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            _scenario(app.test_client())
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+
+        results, seen = [], set()
+        with app.app_context(), engine.connect() as conn:
+            for statement, parameters in statements:
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                plan = [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+                # Plans name aliased tables by their alias ("SCAN users_1")
+                aliases = {alias: name for name, alias in _ALIAS.findall(statement) if name in tables}
+                scans = sorted({aliases.get(m.group(1), m.group(1)) for line in plan if (m := _FULL_SCAN.match(line))}
+                               & tables)
+                if scans and _is_bounded_walk(statement, plan):
+                    scans = []
+                results.append((statement, plan, scans))
+    return results
+
+
+# Read endpoints whose result grows with the data, as (method, path, json).
+# Each should run the same number of statements however many rows it returns.
+_GROWTH_REQUESTS = [
+    ('GET', '/api/movies?limit=50', None),
+    ('GET', '/api/movies?sort=title&limit=50', None),
+    ('GET', '/api/movies?q=movie&limit=50', None),
+    ('GET', '/api/movies/cards', None),
+    ('GET', '/api/leaderboards/top_rated?limit=50', None),
+    ('GET', '/api/leaderboards/most_reviewed?limit=50', None),
+    ('GET', '/api/leaderboards/trending?limit=50', None),
+    ('GET', '/api/search?q=movie&limit=50&top_reviews=3', None),
+    ('GET', '/api/movies/1', None),
+    ('GET', '/api/movies/1/reviews', None),
+    ('GET', '/api/users/1', None),
+    ('GET', '/api/users/1/reviews?limit=50', None),
+    ('GET', '/api/users/1/recommendations', None),
+    ('POST', '/api/reviews/votes:batch', lambda review_ids: {'review_ids': review_ids}),
+]
+
+
+def _add_rows(client, owner, start, stop):
+    """Movies start..stop-1, each reviewed by the owner and by a user of its own who also reviews movie 1."""
+    for i in range(start, stop):
+        name = f'user{i}'
+        client.post('/api/auth/register', json={'username': name, 'email': f'{name}@example.com', 'password': 'password123'})
+        token = client.post('/api/auth/login', json={'email': f'{name}@example.com', 'password': 'password123'}).get_json()['access_token']
+        user = {'Authorization': f'Bearer {token}'}
+        movie_id = client.post('/api/movies', headers=owner, json={
+            'title': f'Movie {i}', 'description': 'Plot', 'release_date': '2000-01-01', 'director': 'Someone'
+        }).get_json()['movie']['id']
+        client.post(f'/api/movies/{movie_id}/rate', headers=owner, json={'rating': 1 + i % 5, 'content': 'Owner'})
+        client.post(f'/api/movies/{movie_id}/rate', headers=user, json={'rating': 1 + (i + 2) % 5, 'content': 'Own'})
+        if movie_id != 1:
+            client.post('/api/movies/1/rate', headers=user, json={'rating': 3, 'content': 'Also'})
+    for review in client.get('/api/movies/1/reviews').get_json():
+        client.post(f"/api/reviews/{review['id']}/like", headers=owner, json={'is_like': True})
+
+
+def query_growth(config_class, rows=20):
+    """Count the statements each read endpoint runs with 1 movie and with `rows` movies.
+
+    Returns a list of (request, count with 1 row, count with `rows` rows).
+    """
+    from .querycount import count_queries
+
+    with _scratch_app(config_class) as app:
+        client = app.test_client()
+        client.post('/api/auth/register', json={'username': 'owner', 'email': 'owner@example.com', 'password': 'password123'})
+        token = client.post('/api/auth/login', json={'email': 'owner@example.com', 'password': 'password123'}).get_json()['access_token']
+        owner = {'Authorization': f'Bearer {token}'}
+
+        def measure():
+            review_ids = [r['id'] for r in client.get('/api/movies/1/reviews').get_json()]
+            counts = []
+            for method, path, body in _GROWTH_REQUESTS:
+                payload = body(review_ids) if body else None
+                # The first call may warm per-process caches; count the second
+                client.open(path, method=method, headers=owner, json=payload)
+                with app.app_context(), count_queries() as counter:
+                    client.open(path, method=method, headers=owner, json=payload)
+                counts.append(counter['count'])
+            return counts
+
+        _add_rows(client, owner, 0, 1)
+        small = measure()
+        _add_rows(client, owner, 1, rows)
+        large = measure()
+    return [(f'{method} {path}', a, b) for (method, path, _), a, b in zip(_GROWTH_REQUESTS, small, large)]
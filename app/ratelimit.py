@@ -0,0 +1,222 @@
+# app/ratelimit.py
+import threading
+import time
+from collections import Counter
+from flask import request
+from limits.storage import Storage, storage_from_string
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, case, create_engine, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+# Extra storage backends for Flask-Limiter, selected with RATELIMIT_STORAGE_URI.
+# Importing this module registers the URI schemes with `limits`.
+#
+#   memory://                          per-process counters (default, dev only)
+#   sql+sqlite:///path/to/db           counters shared through a SQL table
+#   sql+postgresql://user@host/db
+#   redis://host:6379                  limits' own Redis backend (any Redis-compatible server)
+#   prefetch+<any of the above>        adds the per-worker lease layer below
+
+
+class SQLCounterStorage(Storage):
+    """Fixed-window counters in a `rate_limit_counters` table (SQLite/Postgres/MySQL)."""
+
+    STORAGE_SCHEME = ['sql+sqlite', 'sql+postgresql', 'sql+postgresql+psycopg2', 'sql+mysql', 'sql+mysql+pymysql']
+    PRUNE_EVERY = 1000
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        self.engine = create_engine(uri[len('sql+'):], pool_pre_ping=True)
+        self.table = Table(
+            'rate_limit_counters', MetaData(),
+            Column('key', String(255), primary_key=True),
+            Column('count', Integer, nullable=False),
+            Column('expires_at', Float, nullable=False, index=True),
+        )
+        self.table.create(self.engine, checkfirst=True)
+        self._writes = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return SQLAlchemyError
+
+    def incr(self, key, expiry, amount=1):
+        try:
+            return self._incr(key, expiry, amount)
+        except IntegrityError:
+            # Another process inserted the same key first; it exists now
+            return self._incr(key, expiry, amount)
+
+    def _incr(self, key, expiry, amount):
+        t = self.table
+        now = time.time()
+        with self.engine.begin() as conn:
+            # Restart the window if it has expired, otherwise add to it
+            updated = conn.execute(update(t).where(t.c.key == key).values(
+                count=case((t.c.expires_at <= now, amount), else_=t.c.count + amount),
+                expires_at=case((t.c.expires_at <= now, now + expiry), else_=t.c.expires_at),
+            )).rowcount
+            if not updated:
+                conn.execute(insert(t).values(key=key, count=amount, expires_at=now + expiry))
+            count = conn.execute(select(t.c.count).where(t.c.key == key)).scalar_one()
+
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+        return count
+
+    def get(self, key):
+        t = self.table
+        with self.engine.connect() as conn:
+            count = conn.execute(
+                select(t.c.count).where(t.c.key == key, t.c.expires_at > time.time())
+            ).scalar()
+        return count or 0
+
+    def get_expiry(self, key):
+        t = self.table
+        with self.engine.connect() as conn:
+            expires_at = conn.execute(select(t.c.expires_at).where(t.c.key == key)).scalar()
+        return expires_at or time.time()
+
+    def check(self):
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(select(1))
+            return True
+        except SQLAlchemyError:
+            return False
+
+    def reset(self):
+        with self.engine.begin() as conn:
+            return conn.execute(delete(self.table)).rowcount
+
+    def clear(self, key):
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.key == key))
+
+    def prune(self):
+        """Drop counters whose window has ended."""
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.expires_at <= time.time()))
+
+
+class _Lease:
+    __slots__ = ('base', 'size', 'used', 'expires_at')
+
+    def __init__(self, base, size, used, expires_at):
+        self.base = base
+        self.size = size
+        self.used = used
+        self.expires_at = expires_at
+
+
+class PrefetchStorage(Storage):
+    """Local token-bucket layer over a shared storage.
+
+    Instead of one round trip per request, a worker reserves a block of hits
+    on the shared counter (incr by N) and hands them out locally. The count
+    it reports is its position inside the reserved block, so the limit is
+    never exceeded across workers; the cost is that hits a worker reserved
+    but did not use are lost for the rest of the window. To keep that small
+    for low limits, blocks start at one hit and double (up to `prefetch`)
+    only while a key keeps exhausting them within the same window.
+    """
+
+    STORAGE_SCHEME = [
+        'prefetch+memory', 'prefetch+redis', 'prefetch+rediss',
+        'prefetch+sql+sqlite', 'prefetch+sql+postgresql', 'prefetch+sql+postgresql+psycopg2',
+        'prefetch+sql+mysql', 'prefetch+sql+mysql+pymysql',
+    ]
+
+    def __init__(self, uri, wrap_exceptions=False, prefetch=16, **options):
+        self.inner = storage_from_string(uri[len('prefetch+'):], wrap_exceptions=wrap_exceptions, **options)
+        self.prefetch = max(int(prefetch), 1)
+        self._leases = {}
+        self._lock = threading.Lock()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions)
+
+    @property
+    def base_exceptions(self):
+        return self.inner.base_exceptions
+
+    def incr(self, key, expiry, amount=1):
+        with self._lock:
+            now = time.time()
+            lease = self._leases.get(key)
+            if lease and lease.expires_at > now:
+                if lease.used + amount <= lease.size:
+                    lease.used += amount
+                    return lease.base + lease.used
+                size = min(lease.size * 2, self.prefetch)
+            else:
+                size = 1
+            size = max(size, amount)
+
+            total = self.inner.incr(key, expiry, size)
+            base = total - size
+            expires_at = now + expiry if base == 0 else self.inner.get_expiry(key)
+            self._leases[key] = _Lease(base, size, amount, expires_at)
+            if len(self._leases) > 10000:
+                self._drop_expired(now)
+            return base + amount
+
+    def _drop_expired(self, now):
+        for key in [k for k, lease in self._leases.items() if lease.expires_at <= now]:
+            del self._leases[key]
+
+    def get(self, key):
+        lease = self._leases.get(key)
+        if lease and lease.expires_at > time.time():
+            return lease.base + lease.used
+        return self.inner.get(key)
+
+    def get_expiry(self, key):
+        lease = self._leases.get(key)
+        if lease and lease.expires_at > time.time():
+            return lease.expires_at
+        return self.inner.get_expiry(key)
+
+    def check(self):
+        return self.inner.check()
+
+    def reset(self):
+        with self._lock:
+            self._leases.clear()
+        return self.inner.reset()
+
+    def clear(self, key):
+        with self._lock:
+            self._leases.pop(key, None)
+        self.inner.clear(key)
+
+
+class RateLimitMetrics:
+    """Per-process counts of allowed and rejected requests per rate-limited route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, endpoint, rejected):
+        with self._lock:
+            self._counts[(endpoint, 'rejected' if rejected else 'hit')] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        result = {}
+        for (endpoint, outcome), value in sorted(counts.items()):
+            result.setdefault(endpoint, {'hit': 0, 'rejected': 0})[outcome] = value
+        return result
+
+
+rate_limit_metrics = RateLimitMetrics()
+
+
+def init_rate_limit_metrics(app, limiter):
+    @app.after_request
+    def record_rate_limit(response):
+        # current_limit is only set for requests that went through a limit check
+        if request.endpoint and limiter.current_limit is not None:
+            rate_limit_metrics.record(request.endpoint, response.status_code == 429)
+        return response
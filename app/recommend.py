@@ -0,0 +1,277 @@
+# app/recommend.py
+from collections import defaultdict
+from itertools import chain
+from sqlalchemy import delete, insert, select, update
+from .extensions import db
+from .models import Movie, MovieNeighbor, Review
+
+NEIGHBORS_PER_MOVIE = 50
+# Co-rating count at which a similarity keeps half its weight; damps pairs of
+# movies that only a couple of users happen to have rated together
+SHRINKAGE = 10.0
+# Ratings above this pull a movie's neighbors up, ratings below push them down
+NEUTRAL_RATING = 3
+# Most recent ratings of a user that are merged at request time
+PROFILE_SIZE = 200
+RATINGS_CHUNK_SIZE = 50000
+COLUMN_BLOCK_SIZE = 1000
+ID_CHUNK_SIZE = 500
+
+
+# Item-item collaborative filtering.
+#
+# Offline (`flask recs refresh`, or `flask recs build` for everything across
+# a process pool), the ratings table becomes a users x movies
+# sparse matrix, mean-centered per user and L2-normalized per movie, so that
+# the product of its transpose with itself is the adjusted cosine
+# similarity between movies. Each movie keeps its NEIGHBORS_PER_MOVIE most
+# similar movies in movie_neighbors. Only movies whose ratings changed since
+# the last run (movies.neighbors_stale, set by apply_review_rating) are
+# recomputed, and the lists that point at them are patched.
+#
+# Online, a user's recommendations are a weighted merge of the neighbor lists
+# of the movies they rated: two indexed SELECTs and no matrix work.
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def load_ratings(chunk_size=RATINGS_CHUNK_SIZE):
+    """Read every (user_id, movie_id, rating) from reviews, in keyset chunks, into an int64 array."""
+    import numpy as np
+    parts, last_id = [], 0
+    while True:
+        rows = db.session.execute(
+            select(Review.id, Review.user_id, Review.movie_id, Review.rating)
+            .where(Review.id > last_id).order_by(Review.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        # fromiter over the flattened rows; np.array(rows) is ~100x slower on Row objects
+        flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 4)
+        parts.append(flat.reshape(-1, 4)[:, 1:])
+        last_id = rows[-1][0]
+    return np.concatenate(parts) if parts else np.empty((0, 3), dtype=np.int64)
+
+
+class RatingMatrix:
+    """Users x movies ratings, centered per user and normalized per movie."""
+
+    def __init__(self, ratings):
+        import numpy as np
+        from scipy import sparse
+
+        users, user_rows = np.unique(ratings[:, 0], return_inverse=True)
+        self.movie_ids, columns = np.unique(ratings[:, 1], return_inverse=True)
+        values = ratings[:, 2].astype(np.float64)
+        shape = (len(users), len(self.movie_ids))
+
+        means = np.bincount(user_rows, weights=values, minlength=shape[0]) / np.bincount(user_rows, minlength=shape[0])
+        centered = values - means[user_rows]
+        norms = np.sqrt(np.bincount(columns, weights=centered ** 2, minlength=shape[1]))
+        norms[norms == 0] = 1.0
+
+        self.normalized = sparse.csc_matrix((centered / norms[columns], (user_rows, columns)), shape=shape)
+        self.rated = sparse.csc_matrix((np.ones_like(values), (user_rows, columns)), shape=shape)
+        self.column_of = {int(movie_id): i for i, movie_id in enumerate(self.movie_ids)}
+
+    def neighbors(self, columns, k=NEIGHBORS_PER_MOVIE, shrinkage=SHRINKAGE):
+        """Top-k positively similar movies for each column index in `columns`.
+
+        Returns {movie_id: [(neighbor_id, score), ...]} best first.
+        """
+        import numpy as np
+
+        similarity = (self.normalized[:, columns].T @ self.normalized).tocsr()
+        support = (self.rated[:, columns].T @ self.rated).tocsr()
+        support.data = support.data / (support.data + shrinkage)
+        similarity = similarity.multiply(support).tocsr()
+
+        result = {}
+        for row, column in enumerate(columns):
+            start, end = similarity.indptr[row], similarity.indptr[row + 1]
+            indices, scores = similarity.indices[start:end], similarity.data[start:end]
+            keep = (indices != column) & (scores > 0)
+            indices, scores = indices[keep], scores[keep]
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                indices, scores = indices[top], scores[top]
+            order = np.lexsort((self.movie_ids[indices], -scores))
+            result[int(self.movie_ids[column])] = [
+                (int(self.movie_ids[indices[i]]), float(scores[i])) for i in order
+            ]
+        return result
+
+
+# Set in each pool worker by _init_worker, so the matrix is sent once per
+# process rather than once per block
+_worker_matrix = None
+
+
+def _init_worker(matrix):
+    global _worker_matrix
+    _worker_matrix = matrix
+
+
+def _worker_neighbors(columns, k):
+    return _worker_matrix.neighbors(columns, k)
+
+
+def compute_neighbors(matrix, columns, k=NEIGHBORS_PER_MOVIE, workers=1):
+    """Yield {movie_id: [(neighbor_id, score)]} for `columns`, one column block at a time.
+
+    With more than one worker the blocks are spread over a process pool;
+    blocks are made small enough that every worker gets several.
+    """
+    if workers <= 1:
+        for block in _chunks(columns, COLUMN_BLOCK_SIZE):
+            yield matrix.neighbors(block, k)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    block_size = max(1, min(COLUMN_BLOCK_SIZE, -(-len(columns) // (workers * 4))))
+    blocks = list(_chunks(columns, block_size))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(matrix,)) as pool:
+        yield from pool.map(_worker_neighbors, blocks, [k] * len(blocks))
+
+
+def store_neighbors(neighbors):
+    """Replace the stored lists of the movies in `neighbors` ({movie_id: [(neighbor_id, score)]})."""
+    for chunk in _chunks(neighbors, ID_CHUNK_SIZE):
+        db.session.execute(delete(MovieNeighbor).where(MovieNeighbor.movie_id.in_(chunk)))
+    rows = [
+        {'movie_id': movie_id, 'neighbor_id': neighbor_id, 'score': score}
+        for movie_id, entries in neighbors.items() for neighbor_id, score in entries
+    ]
+    for chunk in _chunks(rows, RATINGS_CHUNK_SIZE):
+        # Core insert on the table: about twice as fast as the ORM bulk path
+        db.session.execute(insert(MovieNeighbor.__table__), chunk)
+
+
+def _patch_reverse_lists(fresh, k):
+    """Update the lists of other movies that point at, or should now point at, a recomputed movie.
+
+    Similarity is symmetric, so the new scores are already known. A movie
+    that drops out of a list is not replaced by the next best candidate;
+    `flask recs refresh --full` restores those.
+    """
+    recomputed = set(fresh)
+    affected = {neighbor_id for entries in fresh.values() for neighbor_id, _ in entries}
+    for chunk in _chunks(recomputed, ID_CHUNK_SIZE):
+        affected.update(db.session.execute(
+            select(MovieNeighbor.movie_id).where(MovieNeighbor.neighbor_id.in_(chunk))
+        ).scalars())
+    affected -= recomputed
+
+    lists = defaultdict(list)
+    for chunk in _chunks(affected, ID_CHUNK_SIZE):
+        rows = db.session.execute(
+            select(MovieNeighbor.movie_id, MovieNeighbor.neighbor_id, MovieNeighbor.score)
+            .where(MovieNeighbor.movie_id.in_(chunk))
+        )
+        for movie_id, neighbor_id, score in rows:
+            if neighbor_id not in recomputed:
+                lists[movie_id].append((neighbor_id, score))
+    for movie_id, entries in fresh.items():
+        for neighbor_id, score in entries:
+            if neighbor_id in affected:
+                lists[neighbor_id].append((movie_id, score))
+
+    return {movie_id: sorted(lists[movie_id], key=lambda e: (-e[1], e[0]))[:k] for movie_id in affected}
+
+
+def _mark_stale(movie_ids, stale):
+    for chunk in _chunks(movie_ids, ID_CHUNK_SIZE):
+        db.session.execute(
+            update(Movie).where(Movie.id.in_(chunk)).values(neighbors_stale=stale)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def refresh_neighbors(full=False, k=NEIGHBORS_PER_MOVIE, workers=1):
+    """Recompute the neighbor lists of movies whose ratings changed (every movie if `full`).
+
+    Every list is computed before anything is written, and then swapped in
+    with one short transaction: on SQLite, holding the write lock for the
+    whole computation would make every review, logout and login fail with
+    "database is locked" until the build finished.
+
+    Returns the number of movies whose own list was recomputed.
+    """
+    query = select(Movie.id)
+    if not full:
+        query = query.where(Movie.neighbors_stale == db.true())
+    stale = db.session.execute(query).scalars().all()
+    if not stale:
+        return 0
+
+    # Cleared up front: a rating written while this runs marks its movie again
+    _mark_stale(stale, False)
+    db.session.commit()
+    try:
+        matrix = RatingMatrix(load_ratings())
+        columns = [matrix.column_of[movie_id] for movie_id in stale if movie_id in matrix.column_of]
+        if full:
+            fresh = {}
+            for block in compute_neighbors(matrix, columns, k, workers):
+                fresh.update(block)
+            db.session.execute(delete(MovieNeighbor))
+            store_neighbors(fresh)
+        else:
+            fresh = {movie_id: [] for movie_id in stale}  # movies nobody rates anymore get empty lists
+            for block in compute_neighbors(matrix, columns, k, workers):
+                fresh.update(block)
+            store_neighbors({**fresh, **_patch_reverse_lists(fresh, k)})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        _mark_stale(stale, True)
+        db.session.commit()
+        raise
+    return len(stale)
+
+
+def similar_movies(movie_id, limit):
+    """The stored neighbors of a movie as [(neighbor_id, score)], most similar first."""
+    return db.session.execute(
+        select(MovieNeighbor.neighbor_id, MovieNeighbor.score).where(MovieNeighbor.movie_id == movie_id)
+        .order_by(MovieNeighbor.score.desc(), MovieNeighbor.neighbor_id).limit(limit)
+    ).all()
+
+
+def recommend_for_user(user_id, limit):
+    """Rank unseen movies for a user from the neighbor lists of the movies they rated.
+
+    Returns ([(movie_id, score, because_movie_ids)], rated_movie_ids).
+    """
+    ratings = db.session.execute(
+        select(Review.movie_id, Review.rating).where(Review.user_id == user_id)
+        .order_by(Review.created_at.desc()).limit(PROFILE_SIZE)
+    ).all()
+    weights = {movie_id: rating - NEUTRAL_RATING for movie_id, rating in ratings}
+    sources = [movie_id for movie_id, weight in weights.items() if weight]
+    if not sources:
+        return [], set(weights)
+
+    scores = defaultdict(float)
+    because = defaultdict(list)
+    rows = db.session.execute(
+        select(MovieNeighbor.movie_id, MovieNeighbor.neighbor_id, MovieNeighbor.score)
+        .where(MovieNeighbor.movie_id.in_(sources))
+    )
+    for movie_id, neighbor_id, score in rows:
+        if neighbor_id in weights:
+            continue
+        contribution = score * weights[movie_id]
+        scores[neighbor_id] += contribution
+        if contribution > 0:
+            because[neighbor_id].append((contribution, movie_id))
+
+    ranked = sorted(((m, s) for m, s in scores.items() if s > 0), key=lambda e: (-e[1], e[0]))[:limit]
+    return [
+        (movie_id, score, [source for _, source in sorted(because[movie_id], reverse=True)[:3]])
+        for movie_id, score in ranked
+    ], set(weights)
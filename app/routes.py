@@ -1,12 +1,21 @@
 # app/routes.py
-from flask import Blueprint, request, jsonify, render_template_string, url_for, current_app
-from datetime import datetime
-from .extensions import db
-from .models import Movie, Review, User
-from flask_jwt_extended import jwt_required, get_jwt_identity
-import os
-import time
-from werkzeug.utils import secure_filename
+from flask import Blueprint, request, jsonify
+from datetime import MAXYEAR, MINYEAR, datetime, date
+from .extensions import db, media, response_cache, search_index, suggest_index
+from .media import UploadRejected, variant_urls
+from .models import Movie, Review, ReviewLike, User
+from .aggregates import apply_review_activity, apply_review_rating, apply_review_vote, expire_trending_if_due
+from .querycount import query_budget, unbudgeted
+from .pages import PageRegistry
+from .pagination import decode_cursor, encode_cursor, page_size
+from .recommend import recommend_for_user, similar_movies
+from sqlalchemy import func, literal, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from werkzeug.exceptions import RequestEntityTooLarge
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 
 main_bp = Blueprint('main', __name__)
 
@@ -82,6 +91,18 @@ HTML_LAYOUT = r"""
             window.location.href = '/login';
         }
 
+        // --- Uploaded images ---
+        // Uploads come with resized variants ({card: {webp, jpg}, ...}) that are
+        // written in the background just after the upload; until they exist
+        // (and for external image links, which have none) show the original.
+        function imageSrc(url, variants, name) {
+            return variants && variants[name] ? variants[name].webp : url;
+        }
+
+        function imageFallback(url) {
+            return `onerror="this.onerror=null; this.src='${url}'"`;
+        }
+
         function isLoggedIn() {
             return !!localStorage.getItem('access_token');
         }
@@ -176,16 +197,19 @@ HTML_LAYOUT = r"""
 </html>
 """
 
-PAGE_HOME = HTML_LAYOUT.replace('{{ content|safe }}', r"""
+PAGE_HOME = r"""
 <div class="row mb-4">
     <div class="col-md-6">
         <h2 class="mb-0">Top Rated Movies</h2>
     </div>
     <div class="col-md-6">
         <div class="d-flex gap-2">
-            <input type="text" id="search" class="form-control search-box" placeholder="🔍 Search movies...">
+            <input type="text" id="search" class="form-control search-box" placeholder="🔍 Search movies..." list="search-suggestions" autocomplete="off">
+            <datalist id="search-suggestions"></datalist>
             <select id="sort" class="form-select" style="max-width: 200px;">
                 <option value="rating">Top Rated</option>
+                <option value="reviews">Most Reviewed</option>
+                <option value="trending">Trending This Week</option>
                 <option value="title">Title (A-Z)</option>
                 <option value="recent">Recently Added</option>
             </select>
@@ -194,20 +218,60 @@ PAGE_HOME = HTML_LAYOUT.replace('{{ content|safe }}', r"""
 </div>
 
 <div id="movie-list" class="row"></div>
+<div id="movie-list-sentinel" class="text-center text-secondary py-3"></div>
 
 <script>
-    let allMovies = [];
+    // Movies are fetched one page at a time; searching and sorting happen server-side.
+    let nextCursor = null;
+    let loadingPage = false;
+    let listGeneration = 0;
+    
+    function movieQueryParams() {
+        const params = new URLSearchParams();
+        const searchTerm = document.getElementById('search').value.trim();
+        if(searchTerm) {
+            params.set('q', searchTerm);
+            params.set('top_reviews', '3');
+        }
+        params.set('sort', document.getElementById('sort').value);
+        return params;
+    }
     
-    async function loadMovies() {
-        const res = await fetch('/api/movies');
-        allMovies = await res.json();
-        displayMovies(allMovies);
+    async function loadMovies(reset = false) {
+        if(loadingPage && !reset) return;
+        if(reset) {
+            nextCursor = null;
+            listGeneration++;
+        } else if(nextCursor === null) {
+            return;
+        }
+        const generation = listGeneration;
+        loadingPage = true;
+        
+        const params = movieQueryParams();
+        if(nextCursor) params.set('cursor', nextCursor);
+        try {
+            // Searches are ranked by relevance; browsing uses the selected sort
+            const url = params.has('q') ? '/api/search' : '/api/movies/cards';
+            const res = await fetch(`${url}?${params.toString()}`);
+            const page = await res.json();
+            if(generation !== listGeneration) return;  // a newer search replaced this one
+            nextCursor = page.next_cursor;
+            displayMovies(page.movies, reset);
+        } finally {
+            if(generation === listGeneration) loadingPage = false;
+        }
+        // Short pages can leave the sentinel on screen, where the observer won't fire again
+        const sentinel = document.getElementById('movie-list-sentinel');
+        if(generation === listGeneration && nextCursor && sentinel.getBoundingClientRect().top < window.innerHeight + 600) {
+            loadMovies();
+        }
     }
     
-    function displayMovies(movies) {
+    function displayMovies(movies, reset) {
         const container = document.getElementById('movie-list');
         
-        if(movies.length === 0) {
+        if(reset && movies.length === 0) {
             container.innerHTML = `
                 <div class="empty-state">
                     <div class="empty-state-icon">🎬</div>
@@ -219,7 +283,7 @@ PAGE_HOME = HTML_LAYOUT.replace('{{ content|safe }}', r"""
             return;
         }
 
-        container.innerHTML = '';
+        if(reset) container.innerHTML = '';
         movies.forEach(m => {
             const avgRating = m.average_rating || 0;
             const reviewCount = m.review_count || 0;
@@ -227,19 +291,19 @@ PAGE_HOME = HTML_LAYOUT.replace('{{ content|safe }}', r"""
             // Image handling logic
             let imageHtml = '<div class="movie-poster">🎬</div>';
             if(m.image_url) {
-                imageHtml = `<img src="${m.image_url}" class="movie-poster" style="object-fit: cover;" alt="${m.title}">`;
+                imageHtml = `<img src="${imageSrc(m.image_url, m.image_variants, 'card')}" ${imageFallback(m.image_url)} class="movie-poster" style="object-fit: cover;" alt="${m.title}">`;
             }
             
             // Creator profile picture
             let creatorHtml = 'Unknown';
             if (m.creator) {
                 const creatorProfilePic = m.creator.profile_picture 
-                    ? `<img src="${m.creator.profile_picture}" style="width: 24px; height: 24px; border-radius: 50%; object-fit: cover; border: 1px solid #ffc107; margin-right: 6px;">`
+                    ? `<img src="${imageSrc(m.creator.profile_picture, m.creator.profile_picture_variants, 'avatar_sm')}" ${imageFallback(m.creator.profile_picture)} style="width: 24px; height: 24px; border-radius: 50%; object-fit: cover; border: 1px solid #ffc107; margin-right: 6px;">`
                     : `<div style="width: 24px; height: 24px; border-radius: 50%; background: #444; display: inline-flex; align-items: center; justify-content: center; font-size: 0.8rem; margin-right: 6px;">👤</div>`;
                 creatorHtml = `<a href="/profile?user_id=${m.creator.id}" style="color: #ffc107; text-decoration: none; display: flex; align-items: center;">${creatorProfilePic}<span>${m.creator.username}</span></a>`;
             }
 
-            container.innerHTML += `
+            container.insertAdjacentHTML('beforeend', `
                 <div class="col-md-4 col-lg-3">
                     <div class="flip-card">
                         <div class="flip-card-inner">
@@ -250,8 +314,7 @@ PAGE_HOME = HTML_LAYOUT.replace('{{ content|safe }}', r"""
                             <div class="flip-card-back">
                                 <h6 class="mb-2 text-warning">Top Reviews</h6>
                                 <div id="top-reviews-${m.id}" class="top-reviews" style="font-size: 0.85rem;">
-                                    <p class="text-secondary text-center">Loading...</p>
-                                    <div class="fade-overlay"></div>
+                                    ${renderTopReviews(m.top_reviews)}
                                 </div>
                                 <div class="mt-2 pt-2 border-top border-secondary">
                                     <button onclick="window.location.href='/movie/${m.id}'" class="btn btn-sm btn-warning w-100">View Details</button>
@@ -260,85 +323,76 @@ PAGE_HOME = HTML_LAYOUT.replace('{{ content|safe }}', r"""
                         </div>
                     </div>
                 </div>
-            `;
-            
-            // Load top 3 reviews for this movie
-            loadTopReviewsForMovie(m.id);
+            `);
         });
     }
     
-    async function loadTopReviewsForMovie(movieId) {
-        try {
-            const res = await fetch(`/api/movies/${movieId}/reviews`);
-            const reviews = await res.json();
-            const container = document.getElementById(`top-reviews-${movieId}`);
-
-            if(reviews.length === 0) {
-                container.innerHTML = '<p class="text-secondary text-center">No reviews yet</p>';
-                return;
-            }
-
-            // Fetch votes for all reviews, attach likes count
-            const votesPromises = reviews.map(r =>
-                fetch(`/api/reviews/${r.id}/votes`).then(v => v.ok ? v.json() : {likes:0}).catch(() => ({likes:0}))
-            );
-            const votesArr = await Promise.all(votesPromises);
-            reviews.forEach((r, idx) => { r._likes = (votesArr[idx] && votesArr[idx].likes) ? votesArr[idx].likes : 0; });
-
-            // Sort by likes descending and show top 3
-            const top = reviews.sort((a,b) => (b._likes || 0) - (a._likes || 0)).slice(0, 3);
+    // Top reviews (already ranked by likes) arrive embedded in each movie card
+    function renderTopReviews(reviews) {
+        if(!reviews || reviews.length === 0) {
+            return '<p class="text-secondary text-center">No reviews yet</p>';
+        }
 
-            container.innerHTML = '';
-            top.forEach(r => {
-                const profilePic = r.profile_picture ? `<img src="${r.profile_picture}" style="width: 20px; height: 20px; border-radius: 50%; object-fit: cover; margin-right: 6px;">` : `<div style="width: 20px; height: 20px; border-radius: 50%; background: #444; display: inline-flex; align-items: center; justify-content: center; font-size: 0.6rem; margin-right: 6px;">👤</div>`;
-                container.innerHTML += `
-                    <div style="margin-bottom: 10px; padding: 8px; background: rgba(255,255,255,0.05); border-radius: 6px;">
-                        <div style="display: flex; align-items: center; justify-content: space-between; margin-bottom: 4px;">
-                            <div style="display:flex; align-items:center;">
-                                ${profilePic}
-                                <strong style="color: #ffc107; font-size: 0.8rem;">${r.username}</strong>
-                            </div>
-                            <div style="color: #ffc107; font-size: 0.9rem;">👍${r._likes}</div>
+        let html = '';
+        reviews.forEach(r => {
+            const profilePic = r.profile_picture ? `<img src="${imageSrc(r.profile_picture, r.profile_picture_variants, 'avatar_sm')}" ${imageFallback(r.profile_picture)} style="width: 20px; height: 20px; border-radius: 50%; object-fit: cover; margin-right: 6px;">` : `<div style="width: 20px; height: 20px; border-radius: 50%; background: #444; display: inline-flex; align-items: center; justify-content: center; font-size: 0.6rem; margin-right: 6px;">👤</div>`;
+            html += `
+                <div style="margin-bottom: 10px; padding: 8px; background: rgba(255,255,255,0.05); border-radius: 6px;">
+                    <div style="display: flex; align-items: center; justify-content: space-between; margin-bottom: 4px;">
+                        <div style="display:flex; align-items:center;">
+                            ${profilePic}
+                            <strong style="color: #ffc107; font-size: 0.8rem;">${r.username}</strong>
                         </div>
-                        <div style="color: #ffc107; font-size: 0.75rem; margin-bottom: 4px;">${displayStars(r.rating)}</div>
-                        <p style="margin: 0; font-size: 0.8rem; color: #ccc;">${r.content.substring(0, 80)}${r.content.length > 80 ? '...' : ''}</p>
+                        <div style="color: #ffc107; font-size: 0.9rem;">👍${r.likes}</div>
                     </div>
-                `;
-            });
+                    <div style="color: #ffc107; font-size: 0.75rem; margin-bottom: 4px;">${displayStars(r.rating)}</div>
+                    <p style="margin: 0; font-size: 0.8rem; color: #ccc;">${r.content.substring(0, 80)}${r.content.length > 80 ? '...' : ''}</p>
+                </div>
+            `;
+        });
 
-            container.innerHTML += '<div class="fade-overlay"></div>';
-        } catch(e) {
-            document.getElementById(`top-reviews-${movieId}`).innerHTML = '<p class="text-danger">Error loading reviews</p>';
-        }
+        return html + '<div class="fade-overlay"></div>';
     }
     
+    let searchTimer = null;
     function filterAndSort() {
-        const searchTerm = document.getElementById('search').value.toLowerCase();
-        const sortBy = document.getElementById('sort').value;
-        
-        let filtered = allMovies.filter(m => 
-            m.title.toLowerCase().includes(searchTerm) || 
-            m.description.toLowerCase().includes(searchTerm)
-        );
-        
-        filtered.sort((a, b) => {
-            if(sortBy === 'rating') return (b.average_rating || 0) - (a.average_rating || 0);
-            if(sortBy === 'title') return a.title.localeCompare(b.title);
-            if(sortBy === 'recent') return b.id - a.id;
-            return 0;
-        });
-        
-        displayMovies(filtered);
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => loadMovies(true), 250);
     }
     
+    // Suggestions come from an in-memory index, so they can follow every keystroke
+    let suggestSeq = 0;
+    async function updateSuggestions() {
+        const prefix = document.getElementById('search').value.trim();
+        const seq = ++suggestSeq;
+        const list = document.getElementById('search-suggestions');
+        if(!prefix) { list.innerHTML = ''; return; }
+        const res = await fetch(`/api/movies/suggest?prefix=${encodeURIComponent(prefix)}`);
+        const data = await res.json();
+        if(seq !== suggestSeq) return;
+        list.innerHTML = '';
+        data.suggestions.forEach(s => {
+            const option = document.createElement('option');
+            option.value = s.value;
+            option.label = s.type === 'title' ? 'Movie' : (s.type === 'director' ? 'Director' : 'Cast');
+            list.appendChild(option);
+        });
+    }
+
     document.getElementById('search').addEventListener('input', filterAndSort);
-    document.getElementById('sort').addEventListener('change', filterAndSort);
+    document.getElementById('search').addEventListener('input', updateSuggestions);
+    document.getElementById('sort').addEventListener('change', () => loadMovies(true));
+    
+    // Fetch the next page when the bottom of the list scrolls into view
+    new IntersectionObserver((entries) => {
+        if(entries.some(e => e.isIntersecting)) loadMovies();
+    }, { rootMargin: '600px' }).observe(document.getElementById('movie-list-sentinel'));
     
-    loadMovies();
+    loadMovies(true);
 </script>
-""")
+"""
 
-PAGE_MOVIE_DETAIL = HTML_LAYOUT.replace('{{ content|safe }}', r"""
+PAGE_MOVIE_DETAIL = r"""
 <div class="row">
     <div class="col-md-4">
         <div class="card p-4">
@@ -366,6 +420,11 @@ PAGE_MOVIE_DETAIL = HTML_LAYOUT.replace('{{ content|safe }}', r"""
             <p class="small text-secondary mb-1"><strong>Released</strong></p>
             <p id="release-date" class="text-white"></p>
         </div>
+
+        <div class="card p-4 mt-4" id="similar-section" style="display: none;">
+            <h5 class="mb-3 text-warning">People who liked this also liked</h5>
+            <div id="similar-list"></div>
+        </div>
     </div>
     
     <div class="col-md-8">
@@ -411,7 +470,7 @@ PAGE_MOVIE_DETAIL = HTML_LAYOUT.replace('{{ content|safe }}', r"""
         // Handle image
         if(movie.image_url) {
             document.getElementById('poster-container').innerHTML = 
-                `<img src="${movie.image_url}" style="width:100%; border-radius:12px; box-shadow:0 5px 15px rgba(0,0,0,0.5);">`;
+                `<img src="${imageSrc(movie.image_url, movie.image_variants, 'poster')}" ${imageFallback(movie.image_url)} style="width:100%; border-radius:12px; box-shadow:0 5px 15px rgba(0,0,0,0.5);">`;
         }
 
         document.getElementById('director').textContent = movie.director || 'Unknown';
@@ -426,7 +485,11 @@ PAGE_MOVIE_DETAIL = HTML_LAYOUT.replace('{{ content|safe }}', r"""
     }
     
     async function loadReviews() {
-        const res = await fetch(`/api/movies/${movieId}/reviews`);
+        // Send the token (if any) so each review comes back with our own vote
+        const token = localStorage.getItem('access_token');
+        const res = await fetch(`/api/movies/${movieId}/reviews`, {
+            headers: token ? { 'Authorization': `Bearer ${token}` } : {}
+        });
         const reviews = await res.json();
         const container = document.getElementById('reviews-list');
         const currentUserId = localStorage.getItem('user_id');
@@ -455,10 +518,10 @@ PAGE_MOVIE_DETAIL = HTML_LAYOUT.replace('{{ content|safe }}', r"""
             ` : '';
             
             const profilePicHtml = r.profile_picture 
-                ? `<img src="${r.profile_picture}" style="width: 40px; height: 40px; border-radius: 50%; object-fit: cover; border: 2px solid #ffc107;">`
+                ? `<img src="${imageSrc(r.profile_picture, r.profile_picture_variants, 'avatar_sm')}" ${imageFallback(r.profile_picture)} style="width: 40px; height: 40px; border-radius: 50%; object-fit: cover; border: 2px solid #ffc107;">`
                 : `<div style="width: 40px; height: 40px; border-radius: 50%; background: #444; display: flex; align-items: center; justify-content: center; font-size: 1.2rem;">👤</div>`;
 
-            container.innerHTML += `
+            container.insertAdjacentHTML('beforeend', `
                 <div class="review-card" id="review-${r.id}">
                     <div class="d-flex gap-3 mb-2">
                         <div style="flex-shrink: 0;">
@@ -487,28 +550,21 @@ PAGE_MOVIE_DETAIL = HTML_LAYOUT.replace('{{ content|safe }}', r"""
                         <span>👎<span id="dislike-count-${r.id}">0</span></span>
                     </div>`}
                 </div>
-            `;
+            `);
             
-            // Load vote counts
-            if(isLoggedIn()) {
-                loadVoteCounts(r.id);
-            } else {
-                loadVoteCountsGuest(r.id);
-            }
+            applyVoteState(r.id, r);
         });
     }
     
-    async function loadVoteCounts(reviewId) {
-        const currentUserId = localStorage.getItem('user_id');
-        const res = await fetch(`/api/reviews/${reviewId}/votes?user_id=${currentUserId}`);
-        const data = await res.json();
-        
+    // Counts and the caller's own vote arrive with the review list (or a vote toggle response)
+    function applyVoteState(reviewId, data) {
         document.getElementById(`like-count-${reviewId}`).textContent = data.likes;
         document.getElementById(`dislike-count-${reviewId}`).textContent = data.dislikes;
         
         // Update styling based on user's vote
         const likeVote = document.getElementById(`like-vote-${reviewId}`);
         const dislikeVote = document.getElementById(`dislike-vote-${reviewId}`);
+        if(!likeVote || !dislikeVote) return;  // guest view has no vote buttons
         
         if(data.user_vote === true) {
             likeVote.style.opacity = '1';
@@ -522,14 +578,6 @@ PAGE_MOVIE_DETAIL = HTML_LAYOUT.replace('{{ content|safe }}', r"""
         }
     }
     
-    async function loadVoteCountsGuest(reviewId) {
-        const res = await fetch(`/api/reviews/${reviewId}/votes`);
-        const data = await res.json();
-        
-        document.getElementById(`like-count-${reviewId}`).textContent = data.likes;
-        document.getElementById(`dislike-count-${reviewId}`).textContent = data.dislikes;
-    }
-    
     async function likeReview(reviewId, isLike) {
         if(!requireAuth()) return;
         
@@ -539,7 +587,7 @@ PAGE_MOVIE_DETAIL = HTML_LAYOUT.replace('{{ content|safe }}', r"""
         });
         
         if(res.ok) {
-            await loadVoteCounts(reviewId);
+            applyVoteState(reviewId, await res.json());
         } else {
             alert('Error updating vote');
         }
@@ -627,12 +675,36 @@ PAGE_MOVIE_DETAIL = HTML_LAYOUT.replace('{{ content|safe }}', r"""
         }
     }
     
+    async function loadSimilar() {
+        const res = await fetch(`/api/movies/${movieId}/similar?limit=6`);
+        if(!res.ok) return;
+        const data = await res.json();
+        if(data.movies.length === 0) return;
+
+        const container = document.getElementById('similar-list');
+        data.movies.forEach(m => {
+            const row = document.createElement('div');
+            row.className = 'd-flex justify-content-between align-items-center mb-2';
+            const link = document.createElement('a');
+            link.href = `/movie/${m.id}`;
+            link.textContent = m.title;
+            link.style.cssText = 'color: #ffc107; text-decoration: none;';
+            const rating = document.createElement('span');
+            rating.className = 'small text-secondary';
+            rating.textContent = m.review_count ? `★ ${m.average_rating}` : '';
+            row.append(link, rating);
+            container.appendChild(row);
+        });
+        document.getElementById('similar-section').style.display = 'block';
+    }
+
     loadMovieDetails();
     loadReviews();
+    loadSimilar();
 </script>
-""")
+"""
 
-PAGE_CREATE = HTML_LAYOUT.replace('{{ content|safe }}', r"""
+PAGE_CREATE = r"""
 <div class="row justify-content-center">
     <div class="col-md-8">
         <div class="card p-4">
@@ -811,9 +883,9 @@ PAGE_CREATE = HTML_LAYOUT.replace('{{ content|safe }}', r"""
         });
     })();
 </script>
-""")
+"""
 
-PAGE_PROFILE = HTML_LAYOUT.replace('{{ content|safe }}', r"""
+PAGE_PROFILE = r"""
 <div class="row">
     <div class="col-md-4">
         <div class="card p-4">
@@ -901,7 +973,7 @@ PAGE_PROFILE = HTML_LAYOUT.replace('{{ content|safe }}', r"""
         // Profile picture
         const picContainer = document.getElementById('profile-picture-container');
         if (currentProfile.profile_picture) {
-            picContainer.innerHTML = `<img src="${currentProfile.profile_picture}" style="width: 150px; height: 150px; border-radius: 50%; object-fit: cover; border: 3px solid #ffc107;">`;
+            picContainer.innerHTML = `<img src="${imageSrc(currentProfile.profile_picture, currentProfile.profile_picture_variants, 'avatar')}" ${imageFallback(currentProfile.profile_picture)} style="width: 150px; height: 150px; border-radius: 50%; object-fit: cover; border: 3px solid #ffc107;">`;
         } else {
             picContainer.innerHTML = `<div style="width: 150px; height: 150px; border-radius: 50%; background: #2a2a2a; margin: 0 auto; display: flex; align-items: center; justify-content: center; font-size: 3rem; color: #444;">👤</div>`;
         }
@@ -915,27 +987,26 @@ PAGE_PROFILE = HTML_LAYOUT.replace('{{ content|safe }}', r"""
         }
     }
     
-    async function loadUserReviews() {
+    let reviewsCursor = null;
+    
+    async function loadUserReviews(append = false) {
         try {
-            const res = await fetch('/api/movies');
-            const movies = await res.json();
+            const url = `/api/users/${profileUserId}/reviews${append && reviewsCursor ? `?cursor=${reviewsCursor}` : ''}`;
+            const res = await fetch(url);
+            const page = await res.json();
             const container = document.getElementById('user-reviews-list');
+            const userReviews = page.reviews;
+            reviewsCursor = page.next_cursor;
             
-            let userReviews = [];
-            for (let movie of movies) {
-                const reviewRes = await fetch(`/api/movies/${movie.id}/reviews`);
-                const reviews = await reviewRes.json();
-                userReviews = userReviews.concat(reviews.filter(r => r.user_id == profileUserId).map(r => ({...r, movie_title: movie.title, movie_id: movie.id})));
-            }
-            
-            if (userReviews.length === 0) {
+            if (!append && userReviews.length === 0) {
                 container.innerHTML = '<p class="text-secondary">No reviews yet</p>';
                 return;
             }
             
-            container.innerHTML = '';
+            if (!append) container.innerHTML = '';
+            document.getElementById('load-more-reviews')?.remove();
             userReviews.forEach(review => {
-                container.innerHTML += `
+                container.insertAdjacentHTML('beforeend', `
                     <div class="review-card">
                         <div class="d-flex justify-content-between align-items-start mb-2">
                             <div>
@@ -946,8 +1017,13 @@ PAGE_PROFILE = HTML_LAYOUT.replace('{{ content|safe }}', r"""
                         </div>
                         <p class="mb-0 text-light">${review.content}</p>
                     </div>
-                `;
+                `);
             });
+            
+            if (reviewsCursor) {
+                container.insertAdjacentHTML('beforeend',
+                    '<button id="load-more-reviews" onclick="loadUserReviews(true)" class="btn btn-outline-warning w-100">Load more</button>');
+            }
         } catch (e) {
             console.error('Error loading reviews:', e);
         }
@@ -1035,9 +1111,9 @@ PAGE_PROFILE = HTML_LAYOUT.replace('{{ content|safe }}', r"""
     
     loadProfile();
 </script>
-""")
+"""
 
-PAGE_LOGIN = HTML_LAYOUT.replace('{{ content|safe }}', r"""
+PAGE_LOGIN = r"""
 <div class="row justify-content-center">
     <div class="col-md-4">
         <div class="card p-4">
@@ -1080,9 +1156,9 @@ PAGE_LOGIN = HTML_LAYOUT.replace('{{ content|safe }}', r"""
         if(e.key === 'Enter') doLogin();
     });
 </script>
-""")
+"""
 
-PAGE_REGISTER = HTML_LAYOUT.replace('{{ content|safe }}', r"""
+PAGE_REGISTER = r"""
 <div class="row justify-content-center">
     <div class="col-md-4">
         <div class="card p-4">
@@ -1124,53 +1200,327 @@ PAGE_REGISTER = HTML_LAYOUT.replace('{{ content|safe }}', r"""
         }
     }
 </script>
-""")
+"""
 
 # ==========================================
 #  WEB ROUTES
 # ==========================================
 
+# Pages are rendered and compressed on their first request, see pages.py
+pages = PageRegistry(layout=HTML_LAYOUT)
+pages.register('home', PAGE_HOME)
+pages.register('login', PAGE_LOGIN)
+pages.register('register', PAGE_REGISTER)
+pages.register('create', PAGE_CREATE)
+pages.register('movie_detail', PAGE_MOVIE_DETAIL)
+pages.register('profile', PAGE_PROFILE)
+
 @main_bp.route('/')
-def home(): return render_template_string(PAGE_HOME)
+def home(): return pages.response('home')
 
 @main_bp.route('/login')
-def login_page(): return render_template_string(PAGE_LOGIN)
+def login_page(): return pages.response('login')
 
 @main_bp.route('/register')
-def register_page(): return render_template_string(PAGE_REGISTER)
+def register_page(): return pages.response('register')
 
 @main_bp.route('/create-movie')
-def create_movie_page(): return render_template_string(PAGE_CREATE)
+def create_movie_page(): return pages.response('create')
 
 @main_bp.route('/movie/<int:movie_id>')
-def movie_detail_page(movie_id): return render_template_string(PAGE_MOVIE_DETAIL)
+def movie_detail_page(movie_id): return pages.response('movie_detail')
 
 @main_bp.route('/profile')
 def profile_page(): 
     if not request.args.get('user_id') and not request.cookies.get('access_token') and not request.headers.get('Authorization'):
         # Try to get from localStorage via session
         pass
-    return render_template_string(PAGE_PROFILE)
+    return pages.response('profile')
 
 
 # ==========================================
 #  API ROUTES
 # ==========================================
 
+# Keyset-paginated listing. Each sort maps to (sort column, direction) and is
+# backed by a composite (column, id) index so deep pages stay as cheap as the
+# first one.
+MOVIE_SORTS = {
+    'rating': (Movie.rating_score, 'desc'),
+    'reviews': (Movie.rating_count, 'desc'),
+    'trending': (Movie.trending_count, 'desc'),
+    'title': (Movie.title, 'asc'),
+    'recent': (Movie.id, 'desc'),
+}
+
+def filtered_movies_query(args):
+    """Apply the q/min_rating/release_year/director filters from request args.
+
+    Raises ValueError for a filter value that cannot match anything valid.
+    """
+    query = Movie.query
+
+    q = (args.get('q') or '').strip()
+    if q:
+        # Word-prefix match through the search index; a LIKE '%q%' reads every row
+        query = query.filter(search_index.matching(q))
+
+    min_rating = args.get('min_rating', type=float)
+    if min_rating is not None:
+        query = query.filter(Movie.rating_avg >= min_rating)
+
+    release_year = args.get('release_year', type=int)
+    if release_year is not None:
+        if not MINYEAR <= release_year <= MAXYEAR:
+            raise ValueError(f"release_year must be between {MINYEAR} and {MAXYEAR}")
+        # Range instead of extract(year) so the release_date index is usable
+        query = query.filter(Movie.release_date >= date(release_year, 1, 1),
+                             Movie.release_date <= date(release_year, 12, 31))
+
+    director = (args.get('director') or '').strip()
+    if director:
+        query = query.filter(Movie.director == director)
+
+    return query
+
+def paginate_movies(query, args, sort=None):
+    """Order `query` by `sort` (default: ?sort=) and return one keyset page plus the next cursor."""
+    sort = sort or args.get('sort', 'rating')
+    if sort not in MOVIE_SORTS:
+        raise ValueError(f"Unknown sort '{sort}'")
+    if sort == 'trending':
+        with unbudgeted():
+            expire_trending_if_due()
+    column, direction = MOVIE_SORTS[sort]
+    limit = page_size(args)
+
+    cursor = args.get('cursor')
+    if cursor:
+        if column is Movie.id:
+            (last_id,) = decode_cursor(cursor, 1, types=(int,))
+            query = query.filter(Movie.id < last_id)
+        else:
+            last_value, last_id = decode_cursor(cursor, 2, types=(column.type.python_type, int))
+            key, last = tuple_(column, Movie.id), tuple_(literal(last_value), literal(last_id))
+            query = query.filter(key < last if direction == 'desc' else key > last)
+
+    if column is Movie.id:
+        query = query.order_by(Movie.id.desc())
+    elif direction == 'desc':
+        query = query.order_by(column.desc(), Movie.id.desc())
+    else:
+        query = query.order_by(column.asc(), Movie.id.asc())
+
+    rows = query.limit(limit + 1).all()
+    movies, has_more = rows[:limit], len(rows) > limit
+
+    next_cursor = None
+    if has_more:
+        last = movies[-1]
+        if column is Movie.id:
+            next_cursor = encode_cursor(last.id)
+        else:
+            next_cursor = encode_cursor(getattr(last, column.key), last.id)
+    return movies, next_cursor
+
 @main_bp.route('/api/movies', methods=['GET'])
+@query_budget(1)
+@response_cache.cached(tags=lambda: ['movies', 'profiles'])
 def get_movies():
-    movies = Movie.query.all()
-    return jsonify([movie.to_dict() for movie in movies]), 200
+    # Ratings come from the denormalized columns and the creator is joined in,
+    # so each page is a single SELECT.
+    try:
+        query = filtered_movies_query(request.args).options(joinedload(Movie.creator))
+        movies, next_cursor = paginate_movies(query, request.args)
+    except ValueError as e:  # bad filter, sort or cursor
+        return jsonify({"message": str(e)}), 400
+    return jsonify({
+        "movies": [movie.to_dict() for movie in movies],
+        "next_cursor": next_cursor
+    }), 200
+
+# Leaderboards are the listing sorts restricted to movies that have a score
+# at all, so each page is one range scan of the sort's (column, id) index.
+LEADERBOARDS = {
+    'top_rated': 'rating',
+    'most_reviewed': 'reviews',
+    'trending': 'trending',
+}
+
+@main_bp.route('/api/leaderboards/<kind>', methods=['GET'])
+@query_budget(1)
+@response_cache.cached(tags=lambda kind: ['movies', 'profiles'])
+def get_leaderboard(kind):
+    """Top rated (Bayesian average), most reviewed, or trending (reviews in the last 7 days)."""
+    if kind not in LEADERBOARDS:
+        return jsonify({"message": f"Unknown leaderboard '{kind}'"}), 404
+    sort = LEADERBOARDS[kind]
+    column, _ = MOVIE_SORTS[sort]
+    query = Movie.query.options(joinedload(Movie.creator)).filter(column > 0)
+    try:
+        movies, next_cursor = paginate_movies(query, request.args, sort=sort)
+    except ValueError as e:  # bad cursor
+        return jsonify({"message": str(e)}), 400
+    results = []
+    for movie in movies:
+        result = movie.to_dict()
+        result['score'] = round(getattr(movie, column.key), 4)
+        results.append(result)
+    return jsonify({"leaderboard": kind, "movies": results, "next_cursor": next_cursor}), 200
+
+def top_reviews_for_movies(movie_ids, per_movie):
+    """Return {movie_id: [review dict, ...]} with each movie's most-liked reviews.
+
+    Ranking uses the materialized Review.likes_count, and the per-movie top-N
+    plus the author join happen in one query, so the cost does not depend on
+    how many reviews or votes exist.
+    """
+    if not movie_ids or per_movie <= 0:
+        return {}
+
+    ranked = db.session.query(
+        Review.id, Review.movie_id, Review.rating, Review.content, Review.user_id,
+        Review.created_at, User.username, User.profile_picture,
+        Review.likes_count.label('likes'),
+        func.row_number().over(
+            partition_by=Review.movie_id,
+            order_by=(Review.likes_count.desc(), Review.created_at.desc(), Review.id.desc())
+        ).label('rank')
+    ).join(User, User.id == Review.user_id).filter(Review.movie_id.in_(movie_ids)).subquery()
+
+    rows = db.session.query(ranked).filter(ranked.c.rank <= per_movie).order_by(
+        ranked.c.movie_id, ranked.c.rank
+    ).all()
+
+    result = {movie_id: [] for movie_id in movie_ids}
+    for r in rows:
+        result[r.movie_id].append({
+            'id': r.id,
+            'rating': r.rating,
+            'content': r.content,
+            'username': r.username,
+            'user_id': r.user_id,
+            'profile_picture': r.profile_picture,
+            'profile_picture_variants': variant_urls(r.profile_picture, 'avatar'),
+            'created_at': r.created_at.isoformat(),
+            'likes': int(r.likes)
+        })
+    return result
+
+# Everything the home page needs for one page of movie cards, in one request
+@main_bp.route('/api/movies/cards', methods=['GET'])
+@query_budget(2)
+@response_cache.cached(tags=lambda: ['movies', 'profiles'])
+def get_movie_cards():
+    try:
+        query = filtered_movies_query(request.args).options(joinedload(Movie.creator))
+        movies, next_cursor = paginate_movies(query, request.args)
+    except ValueError as e:  # bad filter, sort or cursor
+        return jsonify({"message": str(e)}), 400
+
+    per_movie = max(0, min(request.args.get('top_reviews', 3, type=int), 10))
+    top_reviews = top_reviews_for_movies([m.id for m in movies], per_movie)
+
+    cards = []
+    for movie in movies:
+        card = movie.to_dict()
+        card['top_reviews'] = top_reviews.get(movie.id, [])
+        cards.append(card)
+    return jsonify({"movies": cards, "next_cursor": next_cursor}), 200
+
+@main_bp.route('/api/search', methods=['GET'])
+@query_budget(3)
+@response_cache.cached(tags=lambda: ['movies', 'profiles'])
+def search_movies():
+    """Full-text search over movie fields and review text, best match first."""
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({"message": "Search query (q) is required"}), 400
+
+    limit = page_size(request.args)
+    after = None
+    if request.args.get('cursor'):
+        try:
+            after = tuple(decode_cursor(request.args['cursor'], 2, types=(float, int)))
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+    hits = search_index.search(q, limit + 1, after)
+    hits, has_more = hits[:limit], len(hits) > limit
+    movie_ids = [movie_id for movie_id, _ in hits]
+    movies = {}
+    if movie_ids:
+        query = Movie.query.options(joinedload(Movie.creator)).filter(Movie.id.in_(movie_ids))
+        movies = {movie.id: movie for movie in query}
+
+    per_movie = max(0, min(request.args.get('top_reviews', 0, type=int), 10))
+    top_reviews = top_reviews_for_movies(movie_ids, per_movie) if per_movie and movie_ids else {}
+
+    results = []
+    for movie_id, score in hits:
+        movie = movies.get(movie_id)
+        if movie is None:  # deleted but not yet dropped from a stale index
+            continue
+        result = movie.to_dict()
+        result['score'] = float(f'{score:.6g}')
+        if per_movie:
+            result['top_reviews'] = top_reviews.get(movie_id, [])
+        results.append(result)
+
+    next_cursor = None
+    if has_more:
+        last_id, last_score = hits[-1]
+        next_cursor = encode_cursor(last_score, last_id)
+    return jsonify({"movies": results, "next_cursor": next_cursor}), 200
+
+MAX_SUGGESTIONS = 20
+
+@main_bp.route('/api/movies/suggest', methods=['GET'])
+@query_budget(0)
+def suggest_movies():
+    """Typeahead: titles, directors and cast names starting with ?prefix=."""
+    limit = max(1, min(request.args.get('limit', 8, type=int), MAX_SUGGESTIONS))
+    suggestions = suggest_index.suggest(request.args.get('prefix', ''), limit)
+    return jsonify({"suggestions": suggestions}), 200
 
 @main_bp.route('/api/movies/<int:movie_id>', methods=['GET'])
+@query_budget(1)
+@response_cache.cached(tags=lambda movie_id: [f'movie:{movie_id}', 'profiles'])
 def get_movie(movie_id):
-    movie = Movie.query.get_or_404(movie_id)
+    movie = Movie.query.options(joinedload(Movie.creator)).filter_by(id=movie_id).first_or_404()
     return jsonify(movie.to_dict()), 200
 
+def optional_user_id():
+    """Return the caller's user id if a valid JWT was sent, otherwise None.
+
+    Public read endpoints use this to personalise responses without turning
+    a stale token into a 401.
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except (JWTExtendedException, PyJWTError):
+        return None
+    return int(identity) if identity else None
+
+def user_votes_for_reviews(user_id, review_ids):
+    """Return {review_id: is_like} for the given user's votes, in one query."""
+    if user_id is None or not review_ids:
+        return {}
+    rows = db.session.query(ReviewLike.review_id, ReviewLike.is_like).filter(
+        ReviewLike.user_id == user_id, ReviewLike.review_id.in_(review_ids)
+    ).all()
+    return {review_id: is_like for review_id, is_like in rows}
+
 @main_bp.route('/api/movies/<int:movie_id>/reviews', methods=['GET'])
+@query_budget(4)
+@response_cache.cached(tags=lambda movie_id: [f'movie:{movie_id}:reviews', 'profiles'], personalized=True)
 def get_movie_reviews(movie_id):
     Movie.query.get_or_404(movie_id)  # Ensure movie exists
-    reviews = Review.query.filter_by(movie_id=movie_id).order_by(Review.created_at.desc()).all()
+    reviews = Review.query.options(joinedload(Review.user)).filter_by(movie_id=movie_id).order_by(Review.created_at.desc()).all()
+    # Vote tallies come from the review row; the caller's own votes (if
+    # logged in) are fetched for the whole list at once.
+    user_votes = user_votes_for_reviews(optional_user_id(), [r.id for r in reviews])
     return jsonify([{
         'id': r.id,
         'rating': r.rating,
@@ -1178,9 +1528,25 @@ def get_movie_reviews(movie_id):
         'username': r.user.username,
         'user_id': r.user_id,
         'profile_picture': r.user.profile_picture,
-        'created_at': r.created_at.isoformat()
+        'profile_picture_variants': variant_urls(r.user.profile_picture, 'avatar'),
+        'created_at': r.created_at.isoformat(),
+        'likes': r.likes_count,
+        'dislikes': r.dislikes_count,
+        'user_vote': user_votes.get(r.id)
     } for r in reviews]), 200
 
+def uploaded_file(field):
+    """The file sent in form field `field`, or None if there is none.
+
+    A body over MAX_CONTENT_LENGTH is reported as an UploadRejected (413)
+    instead of surfacing from whichever line first touches request.files.
+    """
+    try:
+        file = request.files.get(field)
+    except RequestEntityTooLarge:
+        raise UploadRejected.too_large(media.max_bytes)
+    return file if file and file.filename else None
+
 @main_bp.route('/api/movies', methods=['POST'])
 @jwt_required() # Ensure user is logged in with a valid JWT
 def create_movie_api():
@@ -1189,20 +1555,11 @@ def create_movie_api():
         image_url = ''
         release_date_obj = None
 
+        file = uploaded_file('image_file')
         if request.files and 'image_file' in request.files:
             # Form submission with file
-            file = request.files['image_file']
-            # basic validation
-            if file and file.filename:
-                if not file.mimetype.startswith('image/'):
-                    return jsonify({"message": "Uploaded file must be an image"}), 400
-
-                uploads_dir = os.path.join(current_app.static_folder, 'uploads')
-                os.makedirs(uploads_dir, exist_ok=True)
-                filename = f"{int(time.time())}_{secure_filename(file.filename)}"
-                save_path = os.path.join(uploads_dir, filename)
-                file.save(save_path)
-                image_url = url_for('static', filename=f'uploads/{filename}', _external=False)
+            if file is not None:
+                image_url = media.save(file, 'poster')
 
             # get other fields from form
             title = request.form.get('title')
@@ -1247,12 +1604,36 @@ def create_movie_api():
         )
 
         db.session.add(new_movie)
+        db.session.flush()
+        search_index.reindex_movie(new_movie.id)
         db.session.commit()
+        suggest_index.add_movie(new_movie)
+        response_cache.invalidate('movies')
         return jsonify({"message": "Movie added successfully", "movie": new_movie.to_dict()}), 201
+    except UploadRejected as e:
+        db.session.rollback()
+        return jsonify({"message": str(e)}), e.status
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": f"Error adding movie: {str(e)}"}), 500
 
+def invalidate_review_caches(movie_id, user_id, review_id=None):
+    """Drop cached responses affected by a review being added, edited or removed."""
+    tags = ['movies', f'movie:{movie_id}', f'movie:{movie_id}:reviews', f'user:{user_id}:reviews']
+    if review_id is not None:
+        tags.append(f'review:{review_id}:votes')
+    response_cache.invalidate(*tags)
+
+def is_valid_rating(value):
+    """Whether a JSON rating is a whole number of stars; 4.5 or true would skew the aggregates."""
+    return isinstance(value, int) and not isinstance(value, bool) and 1 <= value <= 5
+
+def is_duplicate_review(error):
+    """Whether an IntegrityError is the unique (user_id, movie_id) index rejecting a second review."""
+    message = str(error.orig)
+    # PostgreSQL names the index; SQLite lists its columns
+    return 'uq_reviews_user_movie' in message or 'reviews.user_id, reviews.movie_id' in message
+
 @main_bp.route('/api/movies/<int:movie_id>/rate', methods=['POST'])
 @jwt_required() # Ensure user is logged in with a valid JWT
 def rate_movie(movie_id):
@@ -1261,16 +1642,11 @@ def rate_movie(movie_id):
     
     Movie.query.get_or_404(movie_id)  # Ensure movie exists
     
-    # Check if user already reviewed this movie
-    existing_review = Review.query.filter_by(user_id=current_user_id, movie_id=movie_id).first()
-    if existing_review:
-        return jsonify({"message": "You have already reviewed this movie"}), 400
-    
     if not data.get('rating') or not data.get('content'):
         return jsonify({"message": "Rating and content are required"}), 400
     
-    if not (1 <= data['rating'] <= 5):
-        return jsonify({"message": "Rating must be between 1 and 5"}), 400
+    if not is_valid_rating(data['rating']):
+        return jsonify({"message": "Rating must be a whole number between 1 and 5"}), 400
     
     review = Review(
         rating=data['rating'],
@@ -1279,7 +1655,19 @@ def rate_movie(movie_id):
         movie_id=movie_id
     )
     db.session.add(review)
-    db.session.commit()
+    try:
+        # The unique (user_id, movie_id) index rejects a second review; the
+        # INSERT is flushed before the aggregate UPDATE, so either both land or neither
+        apply_review_rating(movie_id, added=review.rating)
+        apply_review_activity(movie_id, 1)
+        search_index.reindex_movie(movie_id)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if not is_duplicate_review(e):
+            raise
+        return jsonify({"message": "You have already reviewed this movie"}), 400
+    invalidate_review_caches(movie_id, current_user_id)
     return jsonify({"message": "Review added successfully"}), 201
 
 @main_bp.route('/api/reviews/<int:review_id>', methods=['PUT'])
@@ -1297,12 +1685,16 @@ def update_review(review_id):
     if not data.get('rating') or not data.get('content'):
         return jsonify({"message": "Rating and content are required"}), 400
     
-    if not (1 <= data['rating'] <= 5):
-        return jsonify({"message": "Rating must be between 1 and 5"}), 400
+    if not is_valid_rating(data['rating']):
+        return jsonify({"message": "Rating must be a whole number between 1 and 5"}), 400
     
+    if review.rating != data['rating']:
+        apply_review_rating(review.movie_id, added=data['rating'], removed=review.rating)
     review.rating = data['rating']
     review.content = data['content']
+    search_index.reindex_movie(review.movie_id)
     db.session.commit()
+    invalidate_review_caches(review.movie_id, current_user_id)
     
     return jsonify({"message": "Review updated successfully"}), 200
 
@@ -1317,8 +1709,13 @@ def delete_review(review_id):
     if review.user_id != current_user_id:
         return jsonify({"message": "You can only delete your own reviews"}), 403
 
+    movie_id = review.movie_id
+    apply_review_rating(movie_id, removed=review.rating)
+    apply_review_activity(movie_id, -1, review.created_at)
     db.session.delete(review)
+    search_index.reindex_movie(movie_id)
     db.session.commit()
+    invalidate_review_caches(movie_id, current_user_id, review_id)
     return jsonify({"message": "Review deleted successfully"}), 200
 
 # ==========================================
@@ -1326,10 +1723,108 @@ def delete_review(review_id):
 # ==========================================
 
 @main_bp.route('/api/users/<int:user_id>', methods=['GET'])
+@query_budget(1)
+@response_cache.cached(tags=lambda user_id: [f'user:{user_id}'])
 def get_user_profile(user_id):
     user = User.query.get_or_404(user_id)
     return jsonify(user.to_dict()), 200
 
+@main_bp.route('/api/users/<int:user_id>/reviews', methods=['GET'])
+@query_budget(2)
+@response_cache.cached(tags=lambda user_id: [f'user:{user_id}:reviews'])
+def get_user_reviews(user_id):
+    User.query.get_or_404(user_id)  # Ensure user exists
+    limit = page_size(request.args)
+
+    query = db.session.query(
+        Review.id, Review.rating, Review.content, Review.created_at,
+        Review.movie_id, Movie.title.label('movie_title')
+    ).join(Movie, Movie.id == Review.movie_id).filter(Review.user_id == user_id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            last_created, last_id = decode_cursor(cursor, 2, types=(str, int))
+            last_created = datetime.fromisoformat(last_created)
+        except ValueError:
+            return jsonify({"message": "Invalid cursor"}), 400
+        query = query.filter(tuple_(Review.created_at, Review.id) < tuple_(literal(last_created), literal(last_id)))
+
+    rows = query.order_by(Review.created_at.desc(), Review.id.desc()).limit(limit + 1).all()
+    reviews = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(reviews[-1].created_at.isoformat(), reviews[-1].id)
+
+    return jsonify({
+        "reviews": [{
+            'id': r.id,
+            'rating': r.rating,
+            'content': r.content,
+            'user_id': user_id,
+            'movie_id': r.movie_id,
+            'movie_title': r.movie_title,
+            'created_at': r.created_at.isoformat()
+        } for r in reviews],
+        "next_cursor": next_cursor
+    }), 200
+
+MAX_SIMILAR = 50
+
+@main_bp.route('/api/movies/<int:movie_id>/similar', methods=['GET'])
+@query_budget(3)
+@response_cache.cached(tags=lambda movie_id: [f'movie:{movie_id}', 'neighbors'])
+def get_similar_movies(movie_id):
+    """People who liked this movie also liked: its precomputed neighbors, most similar first."""
+    Movie.query.get_or_404(movie_id)
+    limit = max(1, min(request.args.get('limit', 8, type=int), MAX_SIMILAR))
+
+    neighbors = similar_movies(movie_id, limit)
+    query = Movie.query.options(joinedload(Movie.creator)).filter(Movie.id.in_([m for m, _ in neighbors]))
+    movies = {movie.id: movie for movie in query} if neighbors else {}
+    results = []
+    for neighbor_id, score in neighbors:
+        if neighbor_id in movies:
+            result = movies[neighbor_id].to_dict()
+            result['score'] = round(score, 4)
+            results.append(result)
+    return jsonify({"movies": results}), 200
+
+MAX_RECOMMENDATIONS = 50
+
+@main_bp.route('/api/users/<int:user_id>/recommendations', methods=['GET'])
+@query_budget(4)
+@response_cache.cached(tags=lambda user_id: [f'user:{user_id}:reviews', 'movies', 'neighbors'])
+def get_user_recommendations(user_id):
+    """Movies the user has not rated, ranked from the precomputed item-item neighbors."""
+    User.query.get_or_404(user_id)
+    limit = max(1, min(request.args.get('limit', 12, type=int), MAX_RECOMMENDATIONS))
+
+    ranked, rated = recommend_for_user(user_id, limit)
+    if ranked:
+        source = 'ratings'
+        query = Movie.query.options(joinedload(Movie.creator)).filter(Movie.id.in_([m for m, _, _ in ranked]))
+        movies = {movie.id: movie for movie in query}
+        results = []
+        for movie_id, score, because in ranked:
+            if movie_id in movies:
+                result = movies[movie_id].to_dict()
+                result['score'] = round(score, 4)
+                result['because'] = because
+                results.append(result)
+    else:
+        # No usable rating history yet (or neighbors not computed): top rated movies
+        source = 'popular'
+        # rating_score is 0 exactly when there are no ratings; filtering on it
+        # lets the (rating_score, id) index bound the walk
+        query = Movie.query.options(joinedload(Movie.creator)).filter(Movie.rating_score > 0)
+        if rated:
+            query = query.filter(Movie.id.notin_(rated))
+        movies = query.order_by(Movie.rating_score.desc(), Movie.id.desc()).limit(limit).all()
+        results = [movie.to_dict() for movie in movies]
+
+    return jsonify({"recommendations": results, "source": source}), 200
+
 @main_bp.route('/api/users/profile', methods=['GET'])
 @jwt_required()
 def get_current_user_profile():
@@ -1344,19 +1839,11 @@ def update_user_profile():
     user = User.query.get_or_404(current_user_id)
     
     try:
+        file = uploaded_file('profile_picture')
         if request.files and 'profile_picture' in request.files:
             # Handle file upload
-            file = request.files['profile_picture']
-            if file and file.filename:
-                if not file.mimetype.startswith('image/'):
-                    return jsonify({"message": "Uploaded file must be an image"}), 400
-                
-                uploads_dir = os.path.join(current_app.static_folder, 'uploads')
-                os.makedirs(uploads_dir, exist_ok=True)
-                filename = f"profile_{current_user_id}_{int(time.time())}_{secure_filename(file.filename)}"
-                save_path = os.path.join(uploads_dir, filename)
-                file.save(save_path)
-                user.profile_picture = url_for('static', filename=f'uploads/{filename}', _external=False)
+            if file is not None:
+                user.profile_picture = media.save(file, 'avatar')
             
             # Get other fields from form
             bio = request.form.get('bio', '')
@@ -1370,8 +1857,13 @@ def update_user_profile():
         user.bio = bio
         user.favorite_genres = favorite_genres
         db.session.commit()
+        # Usernames/avatars are embedded in movie and review lists too
+        response_cache.invalidate(f'user:{current_user_id}', 'profiles')
         
         return jsonify({"message": "Profile updated successfully", "user": user.to_dict()}), 200
+    except UploadRejected as e:
+        db.session.rollback()
+        return jsonify({"message": str(e)}), e.status
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": f"Error updating profile: {str(e)}"}), 500
@@ -1379,57 +1871,97 @@ def update_user_profile():
 @main_bp.route('/api/reviews/<int:review_id>/like', methods=['POST'])
 @jwt_required()
 def like_review(review_id):
-    from .models import ReviewLike
     current_user_id = int(get_jwt_identity())
     
     review = Review.query.get_or_404(review_id)
     
     try:
         data = request.get_json() or {}
-        is_like = data.get('is_like', True)  # True for like, False for dislike
+        is_like = bool(data.get('is_like', True))  # True for like, False for dislike
         
         # Check if user already has a like/dislike for this review
         existing_like = ReviewLike.query.filter_by(review_id=review_id, user_id=current_user_id).first()
         
+        # Work out the counter deltas alongside the vote change so both land in one transaction
+        likes_delta = dislikes_delta = 0
         if existing_like:
             if existing_like.is_like == is_like:
                 # User is trying to like/dislike again, so remove it
                 db.session.delete(existing_like)
+                user_vote_type = None
+                if is_like:
+                    likes_delta = -1
+                else:
+                    dislikes_delta = -1
             else:
                 # User is changing their vote
                 existing_like.is_like = is_like
+                user_vote_type = is_like
+                likes_delta, dislikes_delta = (1, -1) if is_like else (-1, 1)
         else:
             # Create new like/dislike
             new_like = ReviewLike(review_id=review_id, user_id=current_user_id, is_like=is_like)
             db.session.add(new_like)
+            user_vote_type = is_like
+            if is_like:
+                likes_delta = 1
+            else:
+                dislikes_delta = 1
         
+        apply_review_vote(review_id, likes_delta, dislikes_delta)
         db.session.commit()
+        # Vote counts also appear in the review list and the movie cards' top reviews
+        response_cache.invalidate(f'review:{review_id}:votes', f'movie:{review.movie_id}:reviews', 'movies')
         
-        # Count likes and dislikes
-        likes = ReviewLike.query.filter_by(review_id=review_id, is_like=True).count()
-        dislikes = ReviewLike.query.filter_by(review_id=review_id, is_like=False).count()
-        
-        # Get current user's vote
-        user_vote = ReviewLike.query.filter_by(review_id=review_id, user_id=current_user_id).first()
-        user_vote_type = user_vote.is_like if user_vote else None
-        
+        # The review was expired by the commit, so this reloads just its row
         return jsonify({
             "message": "Vote recorded",
-            "likes": likes,
-            "dislikes": dislikes,
+            "likes": review.likes_count,
+            "dislikes": review.dislikes_count,
             "user_vote": user_vote_type
         }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": f"Error liking review: {str(e)}"}), 500
 
+MAX_VOTE_BATCH = 500
+
+@main_bp.route('/api/reviews/votes:batch', methods=['POST'])
+@query_budget(3)
+def get_review_votes_batch():
+    data = request.get_json(silent=True) or {}
+    review_ids = data.get('review_ids')
+    if not isinstance(review_ids, list) or not all(isinstance(i, int) for i in review_ids):
+        return jsonify({"message": "review_ids must be a list of integers"}), 400
+    if len(review_ids) > MAX_VOTE_BATCH:
+        return jsonify({"message": f"At most {MAX_VOTE_BATCH} review ids per request"}), 400
+
+    review_ids = list(set(review_ids))
+    counts = {}
+    if review_ids:
+        counts = {
+            r.id: (r.likes_count, r.dislikes_count)
+            for r in db.session.query(Review.id, Review.likes_count, Review.dislikes_count)
+            .filter(Review.id.in_(review_ids))
+        }
+    user_votes = user_votes_for_reviews(optional_user_id(), review_ids)
+
+    return jsonify({"votes": {
+        str(review_id): {
+            "likes": likes,
+            "dislikes": dislikes,
+            "user_vote": user_votes.get(review_id)
+        } for review_id, (likes, dislikes) in counts.items()
+    }}), 200
+
 @main_bp.route('/api/reviews/<int:review_id>/votes', methods=['GET'])
+@query_budget(2)
+@response_cache.cached(tags=lambda review_id: [f'review:{review_id}:votes'])
 def get_review_votes(review_id):
-    from .models import ReviewLike
-    
     try:
-        likes = ReviewLike.query.filter_by(review_id=review_id, is_like=True).count()
-        dislikes = ReviewLike.query.filter_by(review_id=review_id, is_like=False).count()
+        review = db.session.get(Review, review_id)
+        likes = review.likes_count if review else 0
+        dislikes = review.dislikes_count if review else 0
         
         user_vote = None
         # Check for optional user_id query param (provided by client) to return that user's vote
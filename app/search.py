@@ -0,0 +1,398 @@
+# app/search.py
+import bisect
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from sqlalchemy import false, literal_column, select, table, text
+
+FTS_TABLE = 'search_movies'
+
+# Indexed fields and their BM25 weights. The order is also the column order
+# of the FTS5 table, which bm25() takes its weights in.
+FIELDS = (('title', 10.0), ('director', 4.0), ('cast', 4.0), ('description', 1.0), ('reviews', 0.5))
+
+MAX_QUERY_TERMS = 8
+MAX_PREFIX_EXPANSIONS = 64
+
+_WORD = re.compile(r'\w+')
+
+
+def tokenize(value):
+    """Lower-cased, accent-folded words, close to FTS5's `unicode61 remove_diacritics 2`."""
+    value = (value or '').lower()
+    if value.isascii():
+        return _WORD.findall(value)
+    folded = unicodedata.normalize('NFKD', value)
+    return _WORD.findall(''.join(c for c in folded if not unicodedata.combining(c)))
+
+
+def parse_query(q):
+    """Split a query into (term, is_prefix) pairs, all of which must match.
+
+    `term*` asks for a prefix match. The last term is always treated as a
+    prefix so results keep up while the user is still typing.
+    """
+    terms = []
+    for word in (q or '').split():
+        tokens = tokenize(word)
+        terms.extend((token, False) for token in tokens[:-1])
+        if tokens:
+            terms.append((tokens[-1], word.endswith('*')))
+    if terms:
+        terms[-1] = (terms[-1][0], True)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def movie_document(movie, reviews=None):
+    """The text indexed for a movie: its own fields plus all of its review bodies."""
+    from .extensions import db
+    from .models import Review
+    if reviews is None:
+        reviews = db.session.execute(select(Review.content).where(Review.movie_id == movie.id)).scalars()
+    return {
+        'title': movie.title or '',
+        'director': movie.director or '',
+        'cast': movie.cast or '',
+        'description': movie.description or '',
+        'reviews': '\n'.join(content or '' for content in reviews),
+    }
+
+
+class FTS5Backend:
+    """Index kept in the `search_movies` FTS5 table (created by migration 0004)."""
+
+    name = 'fts5'
+
+    def search(self, terms, limit, after=None):
+        from .extensions import db
+        match = ' '.join(f'"{term}"' + ('*' if prefix else '') for term, prefix in terms)
+        weights = ', '.join(str(weight) for _, weight in FIELDS)
+        # bm25() is lower-is-better; negate it so scores sort like every other ranking
+        sql = (f"SELECT id, score FROM (SELECT rowid AS id, -bm25({FTS_TABLE}, {weights}) AS score "
+               f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match)")
+        params = {'match': match, 'limit': limit}
+        if after is not None:
+            sql += " WHERE score < :score OR (score = :score AND id > :id)"
+            params.update(score=after[0], id=after[1])
+        sql += " ORDER BY score DESC, id LIMIT :limit"
+        return [tuple(row) for row in db.session.execute(text(sql), params)]
+
+    def matching(self, terms, fields):
+        from .models import Movie
+        columns = ' '.join(fields)
+        match = f"{{{columns}}} : (" + ' '.join(f'"{term}"' + ('*' if prefix else '') for term, prefix in terms) + ')'
+        rowids = select(literal_column('rowid')).select_from(table(FTS_TABLE)).where(
+            literal_column(FTS_TABLE).match(match))
+        return Movie.id.in_(rowids)
+
+    def update(self, movie_id, document):
+        from .extensions import db
+        columns = ', '.join(f'"{field}"' for field, _ in FIELDS)
+        values = ', '.join(f':{field}' for field, _ in FIELDS)
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': movie_id})
+        if document is not None:
+            db.session.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (:id, {values})"),
+                               {'id': movie_id, **document})
+
+    def rebuild(self, documents):
+        from .extensions import db
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        count = 0
+        for movie_id, document in documents:
+            self.update(movie_id, document)
+            count += 1
+        return count
+
+
+class MemoryBackend:
+    """Pure-Python inverted index with BM25F scoring, one per process.
+
+    Used when the database has no FTS5 table (another database engine, or a
+    SQLite build without FTS5). Postings map a term to {movie id: per-field
+    term frequencies}; prefixes are expanded by bisecting the sorted
+    vocabulary.
+    """
+
+    name = 'python'
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.field_totals = [0] * len(FIELDS)
+        self._vocabulary = None
+
+    def _add(self, movie_id, document):
+        frequencies = defaultdict(lambda: [0] * len(FIELDS))
+        lengths = []
+        for i, (field, _) in enumerate(FIELDS):
+            tokens = tokenize(document[field])
+            lengths.append(len(tokens))
+            for token in tokens:
+                frequencies[token][i] += 1
+        for term, tf in frequencies.items():
+            self.postings[term][movie_id] = tf
+        self.doc_terms[movie_id] = list(frequencies)
+        self.doc_lengths[movie_id] = lengths
+        self.field_totals = [total + n for total, n in zip(self.field_totals, lengths)]
+        self._vocabulary = None
+
+    def _remove(self, movie_id):
+        if movie_id not in self.doc_terms:
+            return
+        for term in self.doc_terms.pop(movie_id):
+            postings = self.postings[term]
+            postings.pop(movie_id, None)
+            if not postings:
+                del self.postings[term]
+        lengths = self.doc_lengths.pop(movie_id)
+        self.field_totals = [total - n for total, n in zip(self.field_totals, lengths)]
+        self._vocabulary = None
+
+    def update(self, movie_id, document):
+        with self._lock:
+            self._remove(movie_id)
+            if document is not None:
+                self._add(movie_id, document)
+
+    def rebuild(self, documents):
+        with self._lock:
+            self._clear()
+            for movie_id, document in documents:
+                self._add(movie_id, document)
+            return len(self.doc_lengths)
+
+    def _expand(self, term, prefix):
+        if not prefix:
+            return [term] if term in self.postings else []
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        start = bisect.bisect_left(self._vocabulary, term)
+        end = bisect.bisect_left(self._vocabulary, term + '\U0010ffff')
+        return self._vocabulary[start:min(end, start + MAX_PREFIX_EXPANSIONS)]
+
+    def matching(self, terms, fields):
+        from .models import Movie
+        positions = [i for i, (field, _) in enumerate(FIELDS) if field in fields]
+        ids = None
+        with self._lock:
+            for term, prefix in terms:
+                term_ids = {movie_id for expanded in self._expand(term, prefix)
+                            for movie_id, tf in self.postings[expanded].items()
+                            if any(tf[i] for i in positions)}
+                ids = term_ids if ids is None else ids & term_ids
+                if not ids:
+                    break
+        return Movie.id.in_(sorted(ids or ()))
+
+    def search(self, terms, limit, after=None):
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if not n_docs:
+                return []
+            averages = [max(total / n_docs, 1e-9) for total in self.field_totals]
+            scores = None
+            for term, prefix in terms:
+                term_scores = defaultdict(float)
+                for expanded in self._expand(term, prefix):
+                    postings = self.postings[expanded]
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for movie_id, tf in postings.items():
+                        lengths = self.doc_lengths[movie_id]
+                        weighted = sum(
+                            weight * f / (1 - self.B + self.B * length / average)
+                            for (_, weight), f, length, average in zip(FIELDS, tf, lengths, averages) if f
+                        )
+                        term_scores[movie_id] += idf * weighted * (self.K1 + 1) / (weighted + self.K1)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    # Every term has to match
+                    scores = {movie_id: score + term_scores[movie_id]
+                              for movie_id, score in scores.items() if movie_id in term_scores}
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if after is not None:
+            last_score, last_id = after
+            ranked = [(movie_id, score) for movie_id, score in ranked
+                      if score < last_score or (score == last_score and movie_id > last_id)]
+        return ranked[:limit]
+
+
+# Search over movies: title, director, cast, description and the text of
+# their reviews, ranked with BM25 (title matches weigh the most).
+#
+# On SQLite with the `search_movies` FTS5 table (migration 0004) the index
+# lives in the database, so every worker sees the same data and updates are
+# part of the write's transaction. Otherwise each process builds an
+# in-memory index on its first search. It picks up its own writes
+# immediately and rebuilds every SEARCH_REFRESH_INTERVAL seconds to catch
+# writes made by other workers. That rebuild runs in one background thread
+# per worker, into a new index that is swapped in when it is complete;
+# requests keep searching the old one meanwhile.
+#
+# Write paths call reindex_movie(movie_id) before committing.
+class SearchIndex:
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.backend = None
+        self.requested = 'auto'
+        self.refresh_interval = 60
+        self._loaded_at = None
+        self._build_lock = threading.Lock()
+        # pid of the process whose background refresh is running, if any
+        self._refreshing = None
+        self._reindexed = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_BACKEND', 'auto')
+        app.config.setdefault('SEARCH_REFRESH_INTERVAL', 60)
+        self.requested = app.config['SEARCH_BACKEND']
+        self.refresh_interval = app.config['SEARCH_REFRESH_INTERVAL']
+        # Resolved on first use so that booting a worker never touches the DB
+        self.backend = None
+        self._loaded_at = None
+
+    def _fts5_available(self):
+        from .extensions import db
+        if db.engine.dialect.name != 'sqlite':
+            return False
+        found = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+        ).first()
+        return found is not None
+
+    def _backend(self):
+        if self.backend is None:
+            from .querycount import unbudgeted
+            with self._lock, unbudgeted():
+                if self.backend is None:
+                    use_fts5 = self.requested in ('auto', 'fts5') and self._fts5_available()
+                    if self.requested == 'fts5' and not use_fts5:
+                        raise RuntimeError(f"SEARCH_BACKEND is 'fts5' but the {FTS_TABLE} table is missing; "
+                                           "run `flask db upgrade` on a SQLite database")
+                    self.backend = FTS5Backend() if use_fts5 else MemoryBackend()
+        return self.backend
+
+    def _documents(self, chunk_size=500):
+        from .extensions import db
+        from .models import Movie, Review
+        last_id = 0
+        while True:
+            movies = Movie.query.filter(Movie.id > last_id).order_by(Movie.id).limit(chunk_size).all()
+            if not movies:
+                return
+            reviews = defaultdict(list)
+            rows = db.session.execute(
+                select(Review.movie_id, Review.content).where(Review.movie_id.in_([m.id for m in movies]))
+            )
+            for movie_id, content in rows:
+                reviews[movie_id].append(content)
+            for movie in movies:
+                yield movie.id, movie_document(movie, reviews[movie.id])
+            last_id = movies[-1].id
+
+    def _refresh_if_stale(self, backend):
+        if backend.name != 'python':
+            return
+        if self._loaded_at is None:
+            # Nothing to serve yet: the first search builds the index, once
+            with self._build_lock:
+                if self._loaded_at is None:
+                    from .querycount import unbudgeted
+                    with unbudgeted():
+                        backend.rebuild(self._documents())
+                    self._loaded_at = time.monotonic()
+            return
+        if not self.refresh_interval or time.monotonic() - self._loaded_at <= self.refresh_interval:
+            return
+        with self._lock:
+            if self._refreshing == os.getpid():
+                return
+            self._refreshing = os.getpid()
+            self._reindexed = set()
+        from flask import current_app
+        threading.Thread(target=self._refresh, args=(current_app._get_current_object(),),
+                         name='search-refresh', daemon=True).start()
+
+    def _refresh(self, app):
+        try:
+            with app.app_context():
+                from .extensions import db
+                from .models import Movie
+                fresh = MemoryBackend()
+                fresh.rebuild(self._documents())
+                with self._lock:
+                    reindexed, self._reindexed = self._reindexed, set()
+                    self.backend = fresh
+                # Writes this worker indexed into the old index while the new one was being built
+                for movie_id in reindexed:
+                    movie = db.session.get(Movie, movie_id)
+                    fresh.update(movie_id, movie_document(movie) if movie is not None else None)
+                self._loaded_at = time.monotonic()
+        except Exception:
+            app.logger.exception("Refreshing the search index failed; serving the previous one")
+            self._loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = None
+
+    def search(self, q, limit, after=None):
+        """Return up to `limit` (movie_id, score) pairs for `q`, ranked after the (score, id) `after`."""
+        terms = parse_query(q)
+        if not terms:
+            return []
+        backend = self._backend()
+        self._refresh_if_stale(backend)
+        return backend.search(terms, limit, after)
+
+    def matching(self, q, fields=('title', 'description')):
+        """A filter on Movie.id for the movies whose `fields` contain every word of `q` as a prefix.
+
+        Unlike search() this does not rank or limit, so it can be combined
+        with other filters and any sort order.
+        """
+        terms = [(term, True) for term, _ in parse_query(q)]
+        if not terms:
+            return false()
+        backend = self._backend()
+        self._refresh_if_stale(backend)
+        return backend.matching(terms, fields)
+
+    def reindex_movie(self, movie_id):
+        """Re-read a movie and its reviews into the index (or drop it if it is gone)."""
+        from .extensions import db
+        from .models import Movie
+        backend = self._backend()
+        if backend.name == 'python' and self._loaded_at is None:
+            return  # built from the database on first search anyway
+        if self._refreshing == os.getpid():
+            # Recorded before re-reading self.backend: either the refresh
+            # replays this movie, or it has already swapped its index in
+            with self._lock:
+                self._reindexed.add(movie_id)
+            backend = self.backend
+        movie = db.session.get(Movie, movie_id)
+        backend.update(movie_id, movie_document(movie) if movie is not None else None)
+
+    def rebuild(self):
+        """Rebuild the whole index from the database; returns the number of movies indexed."""
+        backend = self._backend()
+        count = backend.rebuild(self._documents())
+        self._loaded_at = time.monotonic()
+        return count
@@ -0,0 +1,158 @@
+# app/suggest.py
+import bisect
+import threading
+import time
+from array import array
+from .search import tokenize
+
+MAX_SCAN = 2000
+
+
+def normalize(value):
+    return ' '.join(tokenize(value))
+
+
+# Typeahead over movie titles, directors and cast names.
+#
+# The index is a sorted list of normalized keys with a parallel array of
+# label ids, so a lookup is a bisect to the first key >= prefix followed by a
+# short forward scan; it never touches the database. It is built on the first
+# request in each worker. Movies created here are inserted right away
+# (add_movie); movies created by other workers are picked up by polling for
+# ids above the highest one seen, at most every SUGGEST_SYNC_INTERVAL
+# seconds. Movies are never edited or deleted, so new ids are the only
+# changes there are.
+class SuggestIndex:
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.sync_interval = 5.0
+        self._reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SUGGEST_SYNC_INTERVAL', 5.0)
+        self.sync_interval = app.config['SUGGEST_SYNC_INTERVAL']
+        self._reset()
+
+    def _reset(self):
+        self._keys = []
+        self._refs = array('l')
+        self._labels = []
+        self._people = {}
+        self._loaded = False
+        self._last_id = 0
+        self._local_ids = set()
+        self._last_sync = 0.0
+
+    def _label(self, kind, value, movie_id):
+        self._labels.append({'type': kind, 'value': value, 'movie_id': movie_id})
+        return len(self._labels) - 1
+
+    def _pairs(self, movie):
+        """(key, label id) pairs for a movie.
+
+        Titles are keyed by every word-start suffix, so "wars" finds "Star
+        Wars". Directors and cast members are keyed the same way but are not
+        tied to a movie: a name shared by many movies is indexed once.
+        """
+        words = tokenize(movie.title)
+        if words:
+            label_id = self._label('title', movie.title, movie.id)
+            for i in range(len(words)):
+                yield ' '.join(words[i:]), label_id
+
+        people = [('director', movie.director)] + [('cast', name) for name in (movie.cast or '').split(',')]
+        for kind, name in people:
+            name = (name or '').strip()
+            ident = (kind, name.lower())
+            if not name or ident in self._people:
+                continue
+            words = tokenize(name)
+            if not words:
+                continue
+            label_id = self._people[ident] = self._label(kind, name, None)
+            for i in range(len(words)):
+                yield ' '.join(words[i:]), label_id
+
+    def _load(self, chunk_size=5000):
+        from .models import Movie
+        columns = Movie.query.with_entities(Movie.id, Movie.title, Movie.director, Movie.cast)
+        rows, last_id = [], 0
+        while True:
+            chunk = columns.filter(Movie.id > last_id).order_by(Movie.id).limit(chunk_size).all()
+            if not chunk:
+                break
+            rows.extend(chunk)
+            last_id = chunk[-1].id
+        self.build(rows)
+
+    def build(self, rows):
+        """Replace the index with `rows` (anything with id/title/director/cast), sorted by id."""
+        with self._lock:
+            self._labels, self._people, self._local_ids = [], {}, set()
+            pairs = sorted(pair for row in rows for pair in self._pairs(row))
+            self._keys = [key for key, _ in pairs]
+            self._refs = array('l', (label_id for _, label_id in pairs))
+            self._last_id = rows[-1].id if rows else 0
+            self._loaded = True
+            self._last_sync = time.monotonic()
+
+    def _insert(self, movie):
+        for key, label_id in self._pairs(movie):
+            i = bisect.bisect_right(self._keys, key)
+            self._keys.insert(i, key)
+            self._refs.insert(i, label_id)
+
+    def _sync(self):
+        from .models import Movie
+        rows = (Movie.query.with_entities(Movie.id, Movie.title, Movie.director, Movie.cast)
+                .filter(Movie.id > self._last_id).order_by(Movie.id).all())
+        with self._lock:
+            for row in rows:
+                # Skip rows another thread's sync or add_movie already inserted
+                if row.id > self._last_id and row.id not in self._local_ids:
+                    self._insert(row)
+            if rows:
+                self._last_id = max(self._last_id, rows[-1].id)
+                self._local_ids = {i for i in self._local_ids if i > self._last_id}
+            self._last_sync = time.monotonic()
+
+    def _ensure_fresh(self):
+        from .querycount import unbudgeted
+        if not self._loaded:
+            with self._load_lock, unbudgeted():
+                if not self._loaded:
+                    self._load()
+        elif time.monotonic() - self._last_sync >= self.sync_interval:
+            with unbudgeted():
+                self._sync()
+
+    def add_movie(self, movie):
+        """Make a just-committed movie suggestible in this worker immediately."""
+        if not self._loaded:
+            return  # it will be part of the initial load
+        with self._lock:
+            if movie.id > self._last_id and movie.id not in self._local_ids:
+                self._local_ids.add(movie.id)
+                self._insert(movie)
+
+    def suggest(self, prefix, limit=8):
+        """Up to `limit` {type, value, movie_id} suggestions whose key starts with `prefix`."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        self._ensure_fresh()
+        results, seen = [], set()
+        with self._lock:
+            i = bisect.bisect_left(self._keys, key)
+            end = min(len(self._keys), i + MAX_SCAN)
+            while i < end and len(results) < limit and self._keys[i].startswith(key):
+                label_id = self._refs[i]
+                if label_id not in seen:
+                    seen.add(label_id)
+                    results.append(self._labels[label_id])
+                i += 1
+        return results
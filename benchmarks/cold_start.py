@@ -0,0 +1,98 @@
+# benchmarks/cold_start.py
+"""Measure how long a fresh worker takes to import run.py and answer its first request.
+
+Usage (from the repository root):
+
+    python benchmarks/cold_start.py --runs 10 --path /api/movies
+    python benchmarks/cold_start.py --importtime 15
+
+Each run is a new interpreter, like a freshly forked/spawned worker. The
+database is a throwaway SQLite file brought up to date with `flask db upgrade`
+once beforehand, so the numbers do not include schema creation.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside each child process; the last line of its stdout is the result
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import run
+t1 = time.perf_counter()
+client = run.app.test_client()
+status = client.get(sys.argv[1]).status_code
+t2 = time.perf_counter()
+client.get(sys.argv[1])
+t3 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'first': t2 - t1, 'second': t3 - t2, 'status': status}))
+"""
+
+
+def child_env(db_path):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}')
+    env.pop('QUERY_BUDGET_ENFORCED', None)
+    return env
+
+
+def probe(env, path):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', PROBE, path], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - start
+    return result
+
+
+def import_profile(env, top):
+    """Print the modules with the largest cumulative import time (python -X importtime)."""
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import run'], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time:      self [us] |  cumulative | imported package"
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/api/movies', help='URL of the first request')
+    parser.add_argument('--importtime', type=int, metavar='N', default=0,
+                        help='also list the N slowest imports (python -X importtime)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = child_env(os.path.join(tmp, 'bench.db'))
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'run.py', 'db', 'upgrade'], cwd=ROOT, env=env,
+                       capture_output=True, check=True)
+        probe(env, args.path)  # warm the .pyc and OS file caches
+
+        results = [probe(env, args.path) for _ in range(args.runs)]
+        print(f"{args.runs} cold starts, first request GET {args.path} -> {results[0]['status']}")
+        print(f"{'phase':>16} {'min ms':>9} {'median ms':>10} {'max ms':>9}")
+        for phase, label in (('import', 'import run.py'), ('first', 'first request'),
+                             ('second', 'second request'), ('process', 'whole process')):
+            values = [r[phase] * 1000 for r in results]
+            print(f"{label:>16} {min(values):>9.1f} {statistics.median(values):>10.1f} {max(values):>9.1f}")
+
+        if args.importtime:
+            print()
+            import_profile(env, args.importtime)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/login_throughput.py
+"""Measure /api/auth/login throughput for different password-hash pool sizes.
+
+Usage (from the repository root):
+
+    python benchmarks/login_throughput.py --pool-sizes 0,1,2,4 --requests 200 --concurrency 16
+
+Pool size 0 hashes inline on the request thread (the old behaviour). Each
+run uses a throwaway SQLite database and disables rate limiting.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.extensions import db, password_hasher  # noqa: E402
+
+
+def make_config(db_path, pool_size, rounds, queue_depth):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        RATELIMIT_ENABLED = False
+        BCRYPT_LOG_ROUNDS = rounds
+        PASSWORD_HASH_WORKERS = pool_size
+        PASSWORD_HASH_QUEUE_DEPTH = queue_depth
+    return BenchConfig
+
+
+def run(pool_size, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(make_config(os.path.join(tmp, 'bench.db'), pool_size, args.rounds, args.queue_depth))
+        with app.app_context():
+            db.create_all()
+        client = app.test_client()
+        client.post('/api/auth/register', json={
+            'username': 'bench', 'email': 'bench@example.com', 'password': 'benchmark-password'
+        })
+
+        def login(_):
+            response = client.post('/api/auth/login', json={
+                'email': 'bench@example.com', 'password': 'benchmark-password'
+            })
+            return response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as threads:
+            statuses = list(threads.map(login, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        password_hasher.shutdown()
+
+    ok = statuses.count(200)
+    shed = statuses.count(503)
+    return ok / elapsed, ok, shed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pool-sizes', default='0,1,2,4')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt work factor')
+    parser.add_argument('--queue-depth', type=int, default=1000,
+                        help='hash queue limit (set low to observe 503 load shedding)')
+    args = parser.parse_args()
+
+    print(f"{args.requests} logins, concurrency {args.concurrency}, bcrypt rounds {args.rounds}")
+    print(f"{'pool':>5} {'logins/s':>10} {'ok':>6} {'503':>6} {'seconds':>9}")
+    for size in (int(s) for s in args.pool_sizes.split(',')):
+        throughput, ok, shed, elapsed = run(size, args)
+        print(f"{size:>5} {throughput:>10.1f} {ok:>6} {shed:>6} {elapsed:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/recs_build.py
+"""Measure `flask recs build` runtime and memory on synthetic ratings.
+
+Usage (from the repository root):
+
+    python benchmarks/recs_build.py --ratings 1000000 --movies 5000 --workers 1 4
+
+Creates a throwaway SQLite database with `flask db upgrade`, fills it with
+users, movies and ratings that follow a skewed popularity curve (a few
+movies get most of the ratings, as in real catalogs) and per-genre tastes,
+then runs `flask recs build` once per worker count. Each build is a separate
+process, so its peak RSS figures are not inflated by the data generation.
+"""
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GENRES = 20
+
+
+def synthetic_ratings(n_ratings, n_movies, ratings_per_user, rng):
+    """(user_id, movie_id, rating) rows, at most one per (user, movie)."""
+    popularity = 1.0 / np.arange(1, n_movies + 1) ** 0.8
+    popularity /= popularity.sum()
+    movie_genre = rng.integers(0, GENRES, n_movies + 1)
+
+    n_users = max(1, n_ratings // ratings_per_user)
+    # Draw a little extra to make up for (user, movie) duplicates
+    draws = int(n_ratings * 1.1)
+    users = rng.integers(1, n_users + 1, draws)
+    movies = rng.choice(np.arange(1, n_movies + 1), draws, p=popularity)
+    pairs = np.unique(users * (n_movies + 1) + movies)[:n_ratings]
+    rng.shuffle(pairs)
+    users, movies = pairs // (n_movies + 1), pairs % (n_movies + 1)
+
+    taste = rng.integers(0, GENRES, n_users + 1)
+    liked = movie_genre[movies] == taste[users]
+    ratings = np.clip(np.rint(np.where(liked, 4.3, 2.8) + rng.normal(0, 0.9, len(pairs))), 1, 5).astype(np.int64)
+    return n_users, users, movies, ratings
+
+
+def populate(db_path, n_ratings, n_movies, ratings_per_user, seed):
+    rng = np.random.default_rng(seed)
+    n_users, users, movies, ratings = synthetic_ratings(n_ratings, n_movies, ratings_per_user, rng)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, ?, 'x')",
+                         ((i, f'user{i}', f'user{i}@example.com') for i in range(1, n_users + 1)))
+        conn.executemany("INSERT INTO movies (id, title) VALUES (?, ?)",
+                         ((i, f'Movie {i}') for i in range(1, n_movies + 1)))
+        conn.executemany("INSERT INTO reviews (user_id, movie_id, rating, created_at) "
+                         "VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                         zip(users.tolist(), movies.tolist(), ratings.tolist()))
+    conn.close()
+    return n_users, len(ratings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ratings', type=int, default=1000000)
+    parser.add_argument('--movies', type=int, default=5000)
+    parser.add_argument('--ratings-per-user', type=int, default=40)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}')
+        flask = [sys.executable, '-m', 'flask', '--app', 'run.py']
+        subprocess.run(flask + ['db', 'upgrade'], cwd=ROOT, env=env, capture_output=True, check=True)
+
+        start = time.perf_counter()
+        n_users, n_ratings = populate(db_path, args.ratings, args.movies, args.ratings_per_user, args.seed)
+        print(f"{n_ratings} ratings by {n_users} users over {args.movies} movies "
+              f"(generated in {time.perf_counter() - start:.1f}s)")
+
+        for workers in dict.fromkeys(args.workers):
+            out = subprocess.run(flask + ['recs', 'build', '--workers', str(workers)], cwd=ROOT, env=env,
+                                 capture_output=True, text=True, check=True).stdout
+            print(out.strip().splitlines()[-1])
+
+        conn = sqlite3.connect(db_path)
+        rows, = conn.execute("SELECT COUNT(*) FROM movie_neighbors").fetchone()
+        size = os.path.getsize(db_path)
+        conn.close()
+        print(f"movie_neighbors: {rows} rows; database file {size / 2**20:.0f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/suggest_latency.py
+"""Measure typeahead lookup latency for a synthetic catalog.
+
+Usage (from the repository root):
+
+    python benchmarks/suggest_latency.py --movies 300000 --lookups 20000
+
+Builds the in-memory suggest index from generated titles, directors and cast
+lists (no database involved), then times SuggestIndex lookups for random
+1-6 character prefixes of indexed words plus the cost of one incremental
+insert.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.suggest import SuggestIndex  # noqa: E402
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'then', 'dor', 'vel', 'sta', 'qu', 'bri', 'mon', 'zet', 'ar', 'el', 'ish', 'ton']
+
+
+def word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))).capitalize()
+
+
+def catalog(n, rng):
+    people = [f"{word(rng)} {word(rng)}" for _ in range(max(n // 5, 10))]
+    for movie_id in range(1, n + 1):
+        yield SimpleNamespace(
+            id=movie_id,
+            title=' '.join(word(rng) for _ in range(rng.randint(1, 4))),
+            director=rng.choice(people),
+            cast=', '.join(rng.sample(people, 3)),
+        )
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--movies', type=int, default=300000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--limit', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    movies = list(catalog(args.movies, rng))
+    index = SuggestIndex()
+    index.sync_interval = float('inf')  # no database to poll
+    start = time.perf_counter()
+    index.build(movies)
+    build = time.perf_counter() - start
+    print(f"{args.movies} movies -> {len(index._keys)} keys, built in {build:.2f}s")
+
+    prefixes = []
+    for _ in range(args.lookups):
+        key = rng.choice(index._keys)
+        prefixes.append(key[:rng.randint(1, 6)])
+
+    timings = []
+    for prefix in prefixes:
+        t0 = time.perf_counter()
+        index.suggest(prefix, args.limit)
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+    print(f"{args.lookups} lookups (limit {args.limit}): "
+          f"p50 {percentile(timings, 0.50) * 1e6:.0f} us, p99 {percentile(timings, 0.99) * 1e6:.0f} us, "
+          f"max {timings[-1] * 1e6:.0f} us")
+
+    new_movie = SimpleNamespace(id=args.movies + 1, title='Brand New Feature', director='New Person', cast='Someone Else')
+    t0 = time.perf_counter()
+    index.add_movie(new_movie)
+    print(f"incremental add_movie: {(time.perf_counter() - t0) * 1e3:.2f} ms, "
+          f"suggest('brand') -> {index.suggest('brand', 1)[0]['value']!r}")
+
+
+if __name__ == '__main__':
+    main()
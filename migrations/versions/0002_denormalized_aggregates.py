@@ -0,0 +1,96 @@
+"""denormalized rating aggregates, vote counters and listing indexes
+
+Adds the columns and indexes introduced alongside the rating aggregates,
+keyset pagination, per-user review history, vote counters and blocklist
+pruning, and backfills the aggregates from existing reviews and votes.
+
+Versions of the app before migrations existed created these columns and
+indexes with db.create_all(); anything already present is left alone, so
+such a database can be stamped at 0001 and upgraded.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+RATING_COLUMNS = ['rating_sum', 'rating_count'] + [f'rating_{i}_count' for i in range(1, 6)]
+
+
+INDEXES = [
+    ('ix_movies_rating_avg_id', 'movies', ['rating_avg', 'id']),
+    ('ix_movies_title_id', 'movies', ['title', 'id']),
+    ('ix_movies_release_date', 'movies', ['release_date']),
+    ('ix_movies_director', 'movies', ['director']),
+    ('ix_reviews_user_id_created_at', 'reviews', ['user_id', 'created_at', 'id']),
+    ('ix_token_blacklist_expires_at', 'token_blacklist', ['expires_at']),
+]
+
+
+def add_missing_columns(table, columns):
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+    missing = [c for c in columns if c.name not in existing]
+    if missing:
+        with op.batch_alter_table(table) as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+
+
+def upgrade():
+    add_missing_columns('movies', [
+        *(sa.Column(name, sa.Integer(), nullable=False, server_default='0') for name in RATING_COLUMNS),
+        sa.Column('rating_avg', sa.Float(), nullable=False, server_default='0'),
+    ])
+    add_missing_columns('reviews', [
+        sa.Column('likes_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('dislikes_count', sa.Integer(), nullable=False, server_default='0'),
+    ])
+
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if name not in {i['name'] for i in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+    # Backfill (same result as `flask ratings reconcile` / `flask votes reconcile`)
+    histogram = ", ".join(
+        f"rating_{i}_count = (SELECT COUNT(*) FROM reviews r WHERE r.movie_id = movies.id AND r.rating = {i})"
+        for i in range(1, 6)
+    )
+    op.execute(f"""
+        UPDATE movies SET
+            rating_sum = COALESCE((SELECT SUM(r.rating) FROM reviews r WHERE r.movie_id = movies.id), 0),
+            rating_count = (SELECT COUNT(*) FROM reviews r WHERE r.movie_id = movies.id),
+            {histogram}
+    """)
+    op.execute("""
+        UPDATE movies SET rating_avg = CASE WHEN rating_count > 0
+            THEN CAST(rating_sum AS FLOAT) / rating_count ELSE 0 END
+    """)
+    op.execute("""
+        UPDATE reviews SET
+            likes_count = (SELECT COUNT(*) FROM review_likes l WHERE l.review_id = reviews.id AND l.is_like = true),
+            dislikes_count = (SELECT COUNT(*) FROM review_likes l WHERE l.review_id = reviews.id AND l.is_like = false)
+    """)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+
+    with op.batch_alter_table('reviews') as batch_op:
+        batch_op.drop_column('dislikes_count')
+        batch_op.drop_column('likes_count')
+
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.drop_column('rating_avg')
+        for name in reversed(RATING_COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,51 @@
+"""index and constraint pack for the review/vote hot paths
+
+Indexes that a database created with db.create_all() already has are
+skipped.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('uq_reviews_user_movie', 'reviews', ['user_id', 'movie_id'], True),
+    ('ix_reviews_movie_id_created_at', 'reviews', ['movie_id', 'created_at', 'id'], False),
+    ('ix_reviews_movie_id_likes_count', 'reviews', ['movie_id', 'likes_count'], False),
+    ('ix_reviews_created_at', 'reviews', ['created_at'], False),
+    ('ix_review_likes_review_id_is_like', 'review_likes', ['review_id', 'is_like'], False),
+]
+
+
+def upgrade():
+    # The unique index below replaces rate_movie's "already reviewed" lookup,
+    # so refuse to continue rather than silently dropping duplicate reviews.
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT user_id, movie_id, COUNT(*) FROM reviews GROUP BY user_id, movie_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        pairs = ", ".join(f"(user {u}, movie {m})" for u, m, _ in duplicates[:10])
+        raise RuntimeError(
+            f"Found {len(duplicates)} user/movie pair(s) with more than one review: {pairs}. "
+            "Remove the duplicates, run `flask ratings reconcile`, then upgrade again."
+        )
+
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns, unique in INDEXES:
+        if name not in {i['name'] for i in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
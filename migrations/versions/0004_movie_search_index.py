@@ -0,0 +1,49 @@
+"""movie full-text search index (SQLite FTS5)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def _has_fts5(bind):
+    if bind.dialect.name != 'sqlite':
+        return False
+    return bool(bind.execute(sa.text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+
+def upgrade():
+    # Other databases (and SQLite builds without FTS5) use the in-memory
+    # index in app/search.py instead, so there is nothing to create for them.
+    bind = op.get_bind()
+    if not _has_fts5(bind):
+        return
+
+    op.execute("""
+        CREATE VIRTUAL TABLE search_movies USING fts5(
+            title, director, "cast", description, reviews,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    op.execute("""
+        INSERT INTO search_movies (rowid, title, director, "cast", description, reviews)
+        SELECT m.id, m.title, COALESCE(m.director, ''), COALESCE(m."cast", ''), COALESCE(m.description, ''),
+               COALESCE((SELECT group_concat(r.content, char(10)) FROM reviews r WHERE r.movie_id = m.id), '')
+        FROM movies m
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS search_movies")
@@ -0,0 +1,38 @@
+"""item-item neighbor table for recommendations
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Every existing movie starts out stale, so the first `flask recs refresh`
+    # computes all neighbor lists
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.add_column(sa.Column('neighbors_stale', sa.Boolean(), nullable=False, server_default=sa.true()))
+    op.create_index('ix_movies_neighbors_stale', 'movies', ['neighbors_stale'])
+
+    op.create_table(
+        'movie_neighbors',
+        sa.Column('movie_id', sa.Integer(), sa.ForeignKey('movies.id'), primary_key=True),
+        sa.Column('neighbor_id', sa.Integer(), sa.ForeignKey('movies.id'), primary_key=True),
+        sa.Column('score', sa.Float(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table('movie_neighbors')
+    op.drop_index('ix_movies_neighbors_stale', table_name='movies')
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.drop_column('neighbors_stale')
@@ -0,0 +1,77 @@
+"""leaderboard scores: Bayesian rating score, trending counts and their indexes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# Values of RATING_PRIOR_MEAN, RATING_PRIOR_WEIGHT and TRENDING_WINDOW_HOURS
+# in app/aggregates.py when this migration was written
+PRIOR_MEAN = 3.0
+PRIOR_WEIGHT = 10
+WINDOW_HOURS = 7 * 24
+
+
+def upgrade():
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.add_column(sa.Column('rating_score', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('trending_count', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index('ix_movies_rating_score_id', 'movies', ['rating_score', 'id'])
+    op.create_index('ix_movies_rating_count_id', 'movies', ['rating_count', 'id'])
+    op.create_index('ix_movies_trending_count_id', 'movies', ['trending_count', 'id'])
+
+    buckets = op.create_table(
+        'movie_review_buckets',
+        sa.Column('movie_id', sa.Integer(), sa.ForeignKey('movies.id'), primary_key=True),
+        sa.Column('hour', sa.Integer(), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False),
+    )
+    op.create_index('ix_movie_review_buckets_hour', 'movie_review_buckets', ['hour'])
+
+    # Backfill (same result as `flask ratings reconcile`)
+    op.execute(f"""
+        UPDATE movies SET rating_score = CASE WHEN rating_count > 0
+            THEN (CAST(rating_sum AS FLOAT) + {PRIOR_MEAN * PRIOR_WEIGHT}) / (rating_count + {PRIOR_WEIGHT})
+            ELSE 0 END
+    """)
+
+    conn = op.get_bind()
+    hour_now = int(datetime.now(timezone.utc).timestamp() // 3600)
+    since = datetime.fromtimestamp((hour_now - WINDOW_HOURS + 1) * 3600, timezone.utc).replace(tzinfo=None)
+    counts = {}
+    rows = conn.execute(sa.text("SELECT movie_id, created_at FROM reviews WHERE created_at >= :since"),
+                        {'since': since})
+    for movie_id, created_at in rows:
+        if isinstance(created_at, str):  # SQLite hands back text
+            created_at = datetime.fromisoformat(created_at)
+        hour = int(created_at.replace(tzinfo=timezone.utc).timestamp() // 3600)
+        counts[(movie_id, hour)] = counts.get((movie_id, hour), 0) + 1
+    if counts:
+        op.bulk_insert(buckets, [{'movie_id': m, 'hour': h, 'count': c} for (m, h), c in counts.items()])
+        op.execute("""
+            UPDATE movies SET trending_count = COALESCE(
+                (SELECT SUM(b.count) FROM movie_review_buckets b WHERE b.movie_id = movies.id), 0)
+        """)
+
+
+def downgrade():
+    op.drop_index('ix_movie_review_buckets_hour', table_name='movie_review_buckets')
+    op.drop_table('movie_review_buckets')
+    op.drop_index('ix_movies_trending_count_id', table_name='movies')
+    op.drop_index('ix_movies_rating_count_id', table_name='movies')
+    op.drop_index('ix_movies_rating_score_id', table_name='movies')
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.drop_column('trending_count')
+        batch_op.drop_column('rating_score')
@@ -0,0 +1,38 @@
+"""revocation version counter for the JWT blocklist
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('token_blacklist') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+    # Existing revocations keep their order; the counter continues after them
+    op.execute("UPDATE token_blacklist SET version = id")
+    op.create_index('ix_token_blacklist_version', 'token_blacklist', ['version'])
+
+    op.create_table(
+        'blocklist_version',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False),
+    )
+    op.execute("INSERT INTO blocklist_version (id, version) SELECT 1, COALESCE(MAX(id), 0) FROM token_blacklist")
+
+
+def downgrade():
+    op.drop_table('blocklist_version')
+    op.drop_index('ix_token_blacklist_version', table_name='token_blacklist')
+    with op.batch_alter_table('token_blacklist') as batch_op:
+        batch_op.drop_column('version')
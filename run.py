@@ -4,6 +4,14 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    # The development server is a single process, so it can bring the schema
+    # up to date itself. Under gunicorn & co. run `flask db upgrade` once
+    # before starting the workers instead.
+    from flask_migrate import upgrade
+    from app import init_migrations
+    init_migrations(app)
+    with app.app_context():
+        upgrade()
     app.run(debug=True)
 
 # User Profiles: